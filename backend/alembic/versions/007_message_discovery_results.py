@@ -0,0 +1,35 @@
+"""Add message_discovery_results table
+
+Revision ID: 007
+Revises: 006_fixed
+Create Date: 2025-11-05
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006_fixed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Data sources suggested by a discovery message (one row per suggestion)
+    op.create_table(
+        'message_discovery_results',
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('data_source_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['message_id'], ['conversation_messages.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['data_source_id'], ['database_connections.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('message_id', 'data_source_id')
+    )
+    op.create_index('ix_message_discovery_results_data_source_id', 'message_discovery_results', ['data_source_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_message_discovery_results_data_source_id', table_name='message_discovery_results')
+    op.drop_table('message_discovery_results')
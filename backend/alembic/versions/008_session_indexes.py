@@ -0,0 +1,37 @@
+"""Add indexes for session listing and expiry cleanup
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-11-05
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # get_user_sessions: filter by user, newest activity first
+    op.create_index(
+        'ix_conversation_sessions_user_activity',
+        'conversation_sessions',
+        ['user_id', sa.text('last_activity_at DESC')]
+    )
+
+    # cleanup_expired_sessions: only active sessions are candidates
+    op.create_index(
+        'ix_conversation_sessions_expires_active',
+        'conversation_sessions',
+        ['expires_at'],
+        postgresql_where=sa.text("status = 'active'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_sessions_expires_active', table_name='conversation_sessions')
+    op.drop_index('ix_conversation_sessions_user_activity', table_name='conversation_sessions')
@@ -4,6 +4,8 @@ Generates SQL queries from natural language using LLM.
 Implements 12 Factor Agents Principle #1: Single-Purpose Agents
 """
 
+import re
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
 import structlog
@@ -11,13 +13,19 @@ from openai import AsyncOpenAI
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.services.schema_manager import SchemaManager
+from app.services.schema_manager import schema_manager
 from app.services.context_manager import ContextManager
 from app.services.cache import cache
 
 logger = structlog.get_logger()
 
 
+@lru_cache(maxsize=1)
+def _get_openai_client() -> AsyncOpenAI:
+    """Shared OpenAI client, so per-request agents reuse one HTTP connection pool."""
+    return AsyncOpenAI(api_key=settings.openai_api_key)
+
+
 class SQLAgent:
     """
     Agent responsible for SQL query generation from natural language.
@@ -31,11 +39,17 @@ class SQLAgent:
     Principle #1: Single-Purpose Agent - focused only on SQL generation
     """
 
+    # Whole words only, so identifiers like "last_updated" stay valid
+    _DANGEROUS_KEYWORDS = re.compile(
+        r"\b(DROP|DELETE|TRUNCATE|ALTER|CREATE|INSERT|UPDATE|GRANT|REVOKE)\b",
+        re.IGNORECASE,
+    )
+
     def __init__(self, db: Optional[Session] = None):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = _get_openai_client()
         self.model = settings.openai_model
         self.temperature = settings.openai_temperature
-        self.schema_manager = SchemaManager()
+        self.schema_manager = schema_manager
         self.db = db
         self.context_manager = ContextManager(db=db, cache=cache) if db else None
 
@@ -70,7 +84,7 @@ class SQLAgent:
         )
 
         # Find relevant tables
-        relevant_tables = self.schema_manager.find_relevant_tables(question, schema)
+        relevant_tables = await self.schema_manager.find_relevant_tables(question, schema)
         
         # Get detailed schema for relevant tables
         detailed_schema = self.schema_manager.get_detailed_schema(
@@ -245,24 +259,12 @@ class SQLAgent:
         sql_upper = sql.upper().strip()
         
         # Check for dangerous operations
-        dangerous_keywords = [
-            "DROP",
-            "DELETE",
-            "TRUNCATE",
-            "ALTER",
-            "CREATE",
-            "INSERT",
-            "UPDATE",
-            "GRANT",
-            "REVOKE",
-        ]
-        
-        for keyword in dangerous_keywords:
-            if keyword in sql_upper:
-                return {
-                    "valid": False,
-                    "reason": f"Dangerous keyword detected: {keyword}",
-                }
+        match = self._DANGEROUS_KEYWORDS.search(sql)
+        if match:
+            return {
+                "valid": False,
+                "reason": f"Dangerous keyword detected: {match.group(1).upper()}",
+            }
         
         # Must be a SELECT query
         if not sql_upper.startswith("SELECT"):
@@ -78,6 +78,7 @@ class ChatQueryResponse(BaseModel):
     sql_explanation: Optional[str] = Field(None, description="SQL explanation")
     results: Optional[List[Dict[str, Any]]] = Field(None, description="Query results")
     result_count: Optional[int] = Field(None, description="Total result count")
+    truncated: Optional[bool] = Field(None, description="Whether results were capped at the row limit")
     visualization: Optional[VisualizationConfig] = Field(None, description="Visualization config")
     suggested_actions: Optional[List[str]] = Field(None, description="Suggested follow-up actions")
     context_stats: Optional[ContextStats] = Field(None, description="Context stats")
@@ -312,9 +313,9 @@ async def delete_session(
                 detail="Session not found"
             )
         
-        success = await session_manager.end_session(session_id)
+        ended = await session_manager.end_session(session_id)
         
-        if not success:
+        if not ended:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to end session"
@@ -358,9 +359,9 @@ async def set_session_data_source(
                 detail="Session not found"
             )
         
-        success = await session_manager.set_data_source(session_id, data_source_id)
+        updated = await session_manager.set_data_source(session_id, data_source_id)
         
-        if not success:
+        if not updated:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to set data source"
@@ -19,6 +19,7 @@ from app.schemas.database import (
     DatabaseTestResponse,
 )
 from app.services.auth import get_current_admin, get_current_user
+from app.services.cache import cache
 from app.services.database_connector import DatabaseConnectorFactory
 from app.services.encryption import encryption_service
 
@@ -139,6 +140,9 @@ async def update_database_connection(
     await db.commit()
     await db.refresh(connection)
     
+    # Schema may have changed along with the connection details
+    await cache.invalidate_schema(connection_id)
+    
     logger.info(
         "database.updated",
         database_id=connection_id,
@@ -176,6 +180,7 @@ async def delete_database_connection(
     # Soft delete
     connection.is_active = False
     await db.commit()
+    await cache.invalidate_schema(connection_id)
     
     logger.info(
         "database.deleted",
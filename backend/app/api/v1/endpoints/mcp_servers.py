@@ -74,6 +74,11 @@ class ConnectionTestResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BulkConnectionTestRequest(BaseModel):
+    """Request to test several MCP servers at once"""
+    server_ids: List[str] = Field(..., min_length=1, description="Servers to test")
+
+
 # API Endpoints
 
 @router.post("/servers", response_model=MCPServerResponse, status_code=status.HTTP_201_CREATED)
@@ -267,6 +272,24 @@ async def test_server_connection(
     return ConnectionTestResponse(**result)
 
 
+@router.post("/servers/test", response_model=List[ConnectionTestResponse])
+async def test_server_connections(
+    request: BulkConnectionTestRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Test connections to several MCP servers concurrently (Admin only).
+    
+    Probes run in parallel, so the total time tracks the slowest server
+    rather than the sum of all of them.
+    """
+    manager = get_mcp_manager()
+    results = await manager.test_connections_bulk(db, request.server_ids)
+    
+    return [ConnectionTestResponse(**result) for result in results]
+
+
 @router.post("/servers/{server_id}/connect")
 def connect_to_server(
     server_id: str,
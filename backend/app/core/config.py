@@ -50,6 +50,7 @@ class Settings(BaseSettings):
     refresh_token_expire_days: int = Field(
         default=7, alias="REFRESH_TOKEN_EXPIRE_DAYS"
     )
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
 
     # LLM Configuration
     openai_api_key: str = Field(..., alias="OPENAI_API_KEY")
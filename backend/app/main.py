@@ -195,5 +195,6 @@ if __name__ == "__main__":
         port=settings.api_port,
         reload=settings.debug,
         log_level=settings.log_level.lower(),
+        loop="uvloop",
     )
 
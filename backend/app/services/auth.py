@@ -25,6 +25,7 @@ logger = structlog.get_logger()
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
     bcrypt__truncate_error=False
 )
 
@@ -28,19 +28,21 @@ class CacheService:
     - Rate limiting data
     """
 
-    def __init__(self) -> None:
-        self.redis: Optional[Redis] = None
+    def __init__(self, client: Optional[Redis] = None) -> None:
+        # A preconfigured client (e.g. fakeredis in tests) skips from_url
+        self.redis: Optional[Redis] = client
         self._connected = False
 
     async def connect(self) -> None:
         """Connect to Redis."""
         try:
-            self.redis = await aioredis.from_url(
-                settings.redis_url,
-                password=settings.redis_password,
-                encoding="utf-8",
-                decode_responses=True,
-            )
+            if self.redis is None:
+                self.redis = await aioredis.from_url(
+                    settings.redis_url,
+                    password=settings.redis_password,
+                    encoding="utf-8",
+                    decode_responses=True,
+                )
             # Test connection
             await self.redis.ping()
             self._connected = True
@@ -195,21 +197,111 @@ class CacheService:
 
     # Schema caching
 
-    async def get_schema(self, database_id: int) -> Optional[dict]:
-        """Get cached schema metadata."""
-        key = self._generate_key("schema", str(database_id))
+    async def get_schema_version(self, database_id: int) -> int:
+        """
+        Get the schema cache version for a database.
+        
+        Schema keys embed this version; invalidate_schema bumps it, so fills
+        started before an invalidation land under a key nobody reads.
+        """
+        if not self._connected or not self.redis:
+            return 0
+        
+        key = self._generate_key("schema:ver", str(database_id))
+        try:
+            version = await self.redis.get(key)
+            return int(version) if version else 0
+        except Exception as e:
+            logger.warning("cache.get_failed", key=key, error=str(e))
+            return 0
+
+    async def _schema_key(
+        self,
+        prefix: str,
+        database_id: int,
+        version: Optional[int]
+    ) -> str:
+        """Versioned key for schema data (current version unless given)."""
+        if version is None:
+            version = await self.get_schema_version(database_id)
+        return self._generate_key(f"{prefix}:v{version}", str(database_id))
+
+    async def get_schema(
+        self,
+        database_id: int,
+        version: Optional[int] = None
+    ) -> Optional[dict]:
+        """Get cached schema metadata (current version unless given)."""
+        key = await self._schema_key("schema", database_id, version)
         return await self.get(key)
 
     async def set_schema(
         self, 
         database_id: int, 
         schema: dict, 
-        ttl: int = 3600
+        ttl: int = 3600,
+        version: Optional[int] = None
     ) -> bool:
-        """Cache schema metadata (1 hour TTL by default)."""
-        key = self._generate_key("schema", str(database_id))
+        """
+        Cache schema metadata (1 hour TTL by default).
+        
+        Pass the version read before extracting the schema so a concurrent
+        invalidation is not overwritten with stale data.
+        """
+        key = await self._schema_key("schema", database_id, version)
         return await self.set(key, schema, ttl)
 
+    async def get_schema_info(self, database_id: int) -> Optional[dict]:
+        """Get cached column-level schema info used for SQL generation."""
+        key = await self._schema_key("schema_info", database_id, None)
+        return await self.get(key)
+
+    async def get_schema_info_with_ttl(
+        self, database_id: int
+    ) -> tuple[Optional[dict], int]:
+        """
+        Get cached schema info together with its remaining TTL in seconds.
+        
+        Both are read in one pipelined round trip. The TTL is -2 when the
+        entry is missing (Redis TTL semantics).
+        """
+        if not self._connected or not self.redis:
+            return None, -2
+        
+        key = await self._schema_key("schema_info", database_id, None)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.ttl(key)
+                value, ttl = await pipe.execute()
+            return (json.loads(value) if value else None), ttl
+        except Exception as e:
+            logger.warning("cache.get_failed", key=key, error=str(e))
+            return None, -2
+
+    async def set_schema_info(
+        self,
+        database_id: int,
+        schema_info: dict,
+        ttl: int = 3600,
+        version: Optional[int] = None
+    ) -> bool:
+        """Cache column-level schema info (1 hour TTL by default)."""
+        key = await self._schema_key("schema_info", database_id, version)
+        return await self.set(key, schema_info, ttl)
+
+    async def invalidate_schema(self, database_id: int) -> None:
+        """Invalidate all cached schema data for a database (e.g. after it is edited)."""
+        if not self._connected or not self.redis:
+            return
+        
+        key = self._generate_key("schema:ver", str(database_id))
+        try:
+            # Old-version entries are never read again and age out via their TTL
+            await self.redis.incr(key)
+        except Exception as e:
+            logger.warning("cache.invalidate_failed", key=key, error=str(e))
+
     # Session management
 
     async def set_session(
@@ -6,12 +6,35 @@ maximizing relevance and completeness.
 This is critical for cost management and ensuring the most
 important context is included in every query.
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
 import tiktoken
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Token counts keyed by (encoding, 16-byte digest of the text). Schema and
+# metric text repeats across queries; keying on a digest keeps the cache from
+# holding prompt-sized strings alive
+_TOKEN_COUNT_CACHE_SIZE = 4096
+_token_counts: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+
+
+def _token_count(encoding_name: str, text: str) -> int:
+    """Token count for text under an encoding (memoized by digest)"""
+    key = (encoding_name, hashlib.blake2b(text.encode(), digest_size=16).digest())
+    count = _token_counts.get(key)
+    if count is not None:
+        _token_counts.move_to_end(key)
+        return count
+    
+    count = len(tiktoken.get_encoding(encoding_name).encode(text))
+    _token_counts[key] = count
+    if len(_token_counts) > _TOKEN_COUNT_CACHE_SIZE:
+        _token_counts.popitem(last=False)
+    return count
+
 
 class ContextOptimizer:
     """
@@ -64,7 +87,7 @@ class ContextOptimizer:
             return 0
         
         try:
-            return len(self.tokenizer.encode(text))
+            return _token_count(self.tokenizer.name, text)
         except Exception as e:
             logger.error(f"Error counting tokens: {e}")
             # Fallback: rough estimate (1 token ≈ 4 characters)
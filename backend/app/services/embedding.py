@@ -3,7 +3,7 @@
 Generates and manages vector embeddings for semantic search.
 Uses sentence-transformers for high-quality embeddings.
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import json
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -14,6 +14,18 @@ from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# Upsert query shared by single and batch stores
+_UPSERT_EMBEDDING = text("""
+    INSERT INTO embeddings (namespace, object_id, content, embedding, embedding_metadata)
+    VALUES (:namespace, :object_id, :content, CAST(:embedding_vec AS vector), :embedding_metadata)
+    ON CONFLICT (namespace, object_id) 
+    DO UPDATE SET 
+        content = EXCLUDED.content,
+        embedding = EXCLUDED.embedding,
+        embedding_metadata = EXCLUDED.embedding_metadata,
+        created_at = NOW()
+""")
+
 
 class EmbeddingService:
     """
@@ -26,28 +38,41 @@ class EmbeddingService:
     - Small model size (~80MB)
     """
     
-    def __init__(self):
-        """Initialize embedding model"""
+    def __init__(self, model: Optional[SentenceTransformer] = None):
+        """
+        Initialize embedding model
+        
+        Args:
+            model: Preloaded model (anything with a SentenceTransformer-style
+                encode()); defaults to loading all-MiniLM-L6-v2
+        """
         try:
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.model = model or SentenceTransformer('all-MiniLM-L6-v2')
             self.dimension = 384
             logger.info(f"Embedding model loaded: {self.dimension} dimensions")
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             raise
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(
+        self,
+        text: str,
+        return_numpy: bool = False
+    ) -> Union[List[float], np.ndarray]:
         """
         Generate embedding for text
         
         Args:
             text: Input text to embed
+            return_numpy: Return the float32 vector instead of a list
             
         Returns:
-            List of floats (384 dimensions)
+            List of floats (384 dimensions), or a 1-D array when return_numpy is set
         """
         if not text or not text.strip():
             logger.warning("Empty text provided for embedding")
+            if return_numpy:
+                return np.zeros(self.dimension, dtype=np.float32)
             return [0.0] * self.dimension
         
         try:
@@ -58,6 +83,9 @@ class EmbeddingService:
                 show_progress_bar=False
             )
             
+            if return_numpy:
+                return np.asarray(embedding, dtype=np.float32)
+            
             # Convert to list
             if isinstance(embedding, np.ndarray):
                 embedding = embedding.tolist()
@@ -68,18 +96,24 @@ class EmbeddingService:
             logger.error(f"Error generating embedding: {e}")
             raise
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        return_numpy: bool = False
+    ) -> Union[List[List[float]], np.ndarray]:
         """
         Generate embeddings for multiple texts (more efficient)
         
         Args:
             texts: List of texts to embed
+            return_numpy: Return the float32 (len(texts), dimension) array
+                instead of converting it to lists
             
         Returns:
-            List of embeddings
+            List of embeddings, or a 2-D array when return_numpy is set
         """
         if not texts:
-            return []
+            return np.empty((0, self.dimension), dtype=np.float32) if return_numpy else []
         
         try:
             embeddings = self.model.encode(
@@ -89,6 +123,9 @@ class EmbeddingService:
                 batch_size=32
             )
             
+            if return_numpy:
+                return np.asarray(embeddings, dtype=np.float32)
+            
             # Convert to list of lists
             if isinstance(embeddings, np.ndarray):
                 embeddings = embeddings.tolist()
@@ -124,19 +161,7 @@ class EmbeddingService:
             # Convert list to PostgreSQL vector format
             embedding_str = '[' + ','.join(map(str, embedding)) + ']'
             
-            # Upsert query
-            query = text("""
-                INSERT INTO embeddings (namespace, object_id, content, embedding, embedding_metadata)
-                VALUES (:namespace, :object_id, :content, CAST(:embedding_vec AS vector), :embedding_metadata)
-                ON CONFLICT (namespace, object_id) 
-                DO UPDATE SET 
-                    content = EXCLUDED.content,
-                    embedding = EXCLUDED.embedding,
-                    embedding_metadata = EXCLUDED.embedding_metadata,
-                    created_at = NOW()
-            """)
-            
-            db.execute(query, {
+            db.execute(_UPSERT_EMBEDDING, {
                 "namespace": namespace,
                 "object_id": object_id,
                 "content": content,
@@ -172,28 +197,17 @@ class EmbeddingService:
             contents = [item['content'] for item in items]
             embeddings = self.generate_embeddings_batch(contents)
             
-            # Prepare insert data
-            for item, embedding in zip(items, embeddings):
-                embedding_str = '[' + ','.join(map(str, embedding)) + ']'
-                
-                query = text("""
-                    INSERT INTO embeddings (namespace, object_id, content, embedding, embedding_metadata)
-                    VALUES (:namespace, :object_id, :content, CAST(:embedding_vec AS vector), :embedding_metadata)
-                    ON CONFLICT (namespace, object_id) 
-                    DO UPDATE SET 
-                        content = EXCLUDED.content,
-                        embedding = EXCLUDED.embedding,
-                        embedding_metadata = EXCLUDED.embedding_metadata,
-                        created_at = NOW()
-                """)
-                
-                db.execute(query, {
+            # One executemany round trip for all rows
+            db.execute(_UPSERT_EMBEDDING, [
+                {
                     "namespace": item['namespace'],
                     "object_id": item['object_id'],
                     "content": item['content'],
-                    "embedding_vec": embedding_str,
+                    "embedding_vec": '[' + ','.join(map(str, embedding)) + ']',
                     "embedding_metadata": json.dumps(item.get('metadata', {}))
-                })
+                }
+                for item, embedding in zip(items, embeddings)
+            ])
             
             db.commit()
             logger.info(f"Stored {len(items)} embeddings in batch")
@@ -322,7 +336,7 @@ class EmbeddingService:
 # Singleton instance
 @lru_cache(maxsize=1)
 def get_embedding_service() -> EmbeddingService:
-    """Get singleton embedding service instance"""
+    """Get singleton embedding service instance (loads the model once per process)"""
     return EmbeddingService()
 
 
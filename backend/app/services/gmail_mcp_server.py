@@ -44,6 +44,9 @@ class GmailMCPServer:
     No browser prompts needed!
     """
     
+    # Gmail API limit on calls per HTTP batch request
+    BATCH_SIZE = 100
+    
     def __init__(self, config: Dict[str, Any]):
         """
         Initialize Gmail MCP Server.
@@ -325,15 +328,10 @@ class GmailMCPServer:
                 
                 if message_ids:
                     # Batch mark as read
-                    for msg_id in message_ids[:100]:  # Process in batches
-                        try:
-                            service.users().messages().modify(
-                                userId='me',
-                                id=msg_id,
-                                body={'removeLabelIds': ['UNREAD']}
-                            ).execute()
-                        except Exception as e:
-                            logger.warning("gmail_mcp.mark_read_error", msg_id=msg_id, error=str(e))
+                    for error in self._modify_messages(
+                        service, message_ids, {'removeLabelIds': ['UNREAD']}
+                    ):
+                        logger.warning("gmail_mcp.mark_read_error", msg_id=error['message_id'], error=error['error'])
             
             return result
         except Exception as e:
@@ -455,19 +453,10 @@ class GmailMCPServer:
             creds = get_credentials(account)
             service = build('gmail', 'v1', credentials=creds)
             
-            marked_count = 0
-            errors = []
-            
-            for msg_id in message_ids:
-                try:
-                    service.users().messages().modify(
-                        userId='me',
-                        id=msg_id,
-                        body={'removeLabelIds': ['UNREAD']}
-                    ).execute()
-                    marked_count += 1
-                except Exception as e:
-                    errors.append({"message_id": msg_id, "error": str(e)})
+            errors = self._modify_messages(
+                service, message_ids, {'removeLabelIds': ['UNREAD']}
+            )
+            marked_count = len(message_ids) - len(errors)
             
             return {
                 "success": True,
@@ -478,6 +467,48 @@ class GmailMCPServer:
         except Exception as e:
             return {"error": str(e)}
     
+    def _modify_messages(
+        self,
+        service: Any,
+        message_ids: List[str],
+        body: Dict[str, Any]
+    ) -> List[Dict[str, str]]:
+        """
+        Apply the same modify() to many messages using Gmail batch requests.
+        
+        Each HTTP batch carries up to BATCH_SIZE calls, so N messages cost
+        ceil(N / BATCH_SIZE) round trips instead of N.
+        
+        Args:
+            service: Gmail API service
+            message_ids: IDs of the messages to modify
+            body: modify() request body, e.g. label changes
+            
+        Returns:
+            Per-message errors, in the order of message_ids
+        """
+        errors = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = str(exception)
+        
+        # Request IDs must be unique within a batch
+        unique_ids = list(dict.fromkeys(message_ids))
+        for start in range(0, len(unique_ids), self.BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=on_response)
+            for msg_id in unique_ids[start:start + self.BATCH_SIZE]:
+                batch.add(
+                    service.users().messages().modify(userId='me', id=msg_id, body=body),
+                    request_id=msg_id
+                )
+            batch.execute()
+        
+        return [
+            {"message_id": msg_id, "error": errors[msg_id]}
+            for msg_id in message_ids if msg_id in errors
+        ]
+    
     async def _get_calendar(
         self,
         account: str,
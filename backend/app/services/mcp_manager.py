@@ -3,18 +3,59 @@ MCP Server Manager Service
 
 Manages MCP (Model Context Protocol) server connections and operations.
 """
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
+from dataclasses import dataclass
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Row
 import structlog
+import asyncio
 import uuid
+import re
 
 from app.models.mcp import MCPServer, MCPResource, MCPAccessLog
 from app.services.mcp_connectors import get_connector
 
 logger = structlog.get_logger()
 
+# Canonical UUID string; lets well-formed IDs skip exception-based parsing
+_UUID_RE = re.compile(
+    r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'
+)
+
+
+def _parse_server_id(server_id: Any) -> Optional[uuid.UUID]:
+    """Parse a server ID string into a UUID, returning None if malformed"""
+    if not isinstance(server_id, str) or not _UUID_RE.match(server_id):
+        return None
+    return uuid.UUID(server_id)
+
+
+def _validate_gmail(config: Dict[str, Any]) -> None:
+    """Gmail-specific validation; fills in default_account if missing"""
+    # Validate accounts if provided
+    if 'accounts' in config and not isinstance(config['accounts'], list):
+        raise ValueError("Gmail 'accounts' must be a list")
+    # Set defaults if not provided
+    if 'default_account' not in config:
+        config['default_account'] = config.get('accounts', ['arvinda.reddy@gmail.com'])[0]
+
+
+# Required fields per server type
+_REQUIRED_FIELDS: Dict[str, tuple] = {
+    'github': ('token',),
+    'postgres': ('host', 'port', 'database', 'username', 'password'),
+    'filesystem': ('path',),
+    'sqlite': ('database_path',),
+    'gmail': (),  # No required fields - uses OAuth tokens from ~/.local/share/google-auth/
+}
+
+# Extra per-type validation beyond required fields
+_VALIDATORS: Dict[str, Callable[[Dict[str, Any]], None]] = {
+    'gmail': _validate_gmail,
+}
+
 
 class MCPServerConfig:
     """Configuration for an MCP server"""
@@ -34,6 +75,13 @@ class MCPServerConfig:
         self.organization_id = organization_id
 
 
+@dataclass(slots=True)
+class _ActiveConn:
+    """An active MCP server connection"""
+    connected_at: datetime
+    client: Any = None
+
+
 class MCPServerManager:
     """
     Manages MCP server connections and operations.
@@ -47,7 +95,7 @@ class MCPServerManager:
     """
     
     def __init__(self):
-        self.active_servers: Dict[str, Any] = {}  # server_id -> MCP client
+        self.active_servers: Dict[str, _ActiveConn] = {}
         logger.info("mcp_manager.initialized")
     
     async def register_server(
@@ -89,7 +137,7 @@ class MCPServerManager:
         # Create server record
         # Note: created_by is None for now as User.id is int but MCPServer expects UUID
         # TODO: Update User model to use UUID or MCPServer to use int
-        server = MCPServer(
+        stmt = insert(MCPServer).values(
             name=config.name,
             description=config.description,
             server_type=config.server_type,
@@ -97,25 +145,51 @@ class MCPServerManager:
             created_by=None,
             organization_id=uuid.UUID(config.organization_id) if config.organization_id else None,
             status='inactive'
-        )
+        ).returning(MCPServer.id)
         
-        db.add(server)
+        # RETURNING hands back the generated ID in the INSERT round trip
+        result = await db.execute(stmt)
+        server_id = str(result.scalar_one())
         await db.commit()
-        await db.refresh(server)
         
-        logger.info("mcp.registered", server_id=str(server.id), name=config.name)
+        logger.info("mcp.registered", server_id=server_id, name=config.name)
         
-        return str(server.id)
+        return server_id
     
-    async def get_server(self, db: AsyncSession, server_id: str) -> Optional[MCPServer]:
-        """Get server by ID"""
-        try:
-            server_uuid = uuid.UUID(server_id)
-            stmt = select(MCPServer).where(MCPServer.id == server_uuid)
-            result = await db.execute(stmt)
-            return result.scalar_one_or_none()
-        except (ValueError, AttributeError):
+    async def get_server(
+        self,
+        db: AsyncSession,
+        server_id: str,
+        fresh: bool = False
+    ) -> Optional[MCPServer]:
+        """
+        Get server by ID.
+        
+        Repeated lookups within the same session are served from the session's
+        identity map without a database round trip. Entities are not cached
+        across sessions, since they are bound to the session that loaded them.
+        
+        Args:
+            db: Database session
+            server_id: Server ID
+            fresh: Reload from the database even if already loaded
+            
+        Returns:
+            Server or None
+        """
+        server_uuid = _parse_server_id(server_id)
+        if server_uuid is None:
             return None
+        
+        return await db.get(MCPServer, server_uuid, populate_existing=fresh)
+    
+    async def _get_server_core(self, db: AsyncSession, server_uuid: uuid.UUID) -> Optional[Row]:
+        """Fetch only (id, server_type, config) without hydrating an ORM entity"""
+        stmt = select(MCPServer.id, MCPServer.server_type, MCPServer.config).where(
+            MCPServer.id == server_uuid
+        )
+        result = await db.execute(stmt)
+        return result.first()
     
     async def list_servers(
         self,
@@ -212,9 +286,8 @@ class MCPServerManager:
         if not server:
             return False
         
-        # Disconnect if active
-        if server_id in self.active_servers:
-            self.disconnect_server(server_id)
+        # Disconnect if active (no-op otherwise)
+        self.disconnect_server(server_id)
         
         await db.delete(server)
         await db.commit()
@@ -234,7 +307,8 @@ class MCPServerManager:
         Returns:
             Dict with status and details
         """
-        server = await self.get_server(db, server_id)
+        server_uuid = _parse_server_id(server_id)
+        server = await self._get_server_core(db, server_uuid) if server_uuid else None
         if not server:
             return {"success": False, "error": "Server not found"}
         
@@ -243,38 +317,115 @@ class MCPServerManager:
         try:
             # Get the appropriate connector and test connection
             connector = get_connector(server.server_type, server.config)
-            result = connector.test_connection()
-            
-            # Update server status based on result
-            if result['success']:
-                server.status = 'active'
-                server.last_connected_at = datetime.utcnow()
-                server.error_message = None
-            else:
-                server.status = 'error'
-                server.error_message = result.get('error', 'Connection failed')
-            
-            await db.commit()
-            
-            return {
-                **result,
-                "server_id": server_id,
-                "server_type": server.server_type
-            }
-            
+            outcome = connector.test_connection()
         except Exception as e:
-            logger.error("mcp.test_connection_failed", error=str(e))
+            outcome = e
+        
+        response = await self._record_test_result(db, server_id, server, outcome)
+        await db.commit()
+        
+        return response
+    
+    async def test_connections_bulk(
+        self,
+        db: AsyncSession,
+        server_ids: List[str],
+        concurrency: int = 8
+    ) -> List[Dict[str, Any]]:
+        """
+        Test connections to several MCP servers concurrently.
+        
+        Connector probes are blocking, so each one runs in a worker thread with
+        at most `concurrency` in flight. Database reads and status updates stay
+        sequential because an AsyncSession does not support concurrent use.
+        
+        Args:
+            db: Database session
+            server_ids: Servers to test
+            concurrency: Maximum number of probes in flight
             
-            server.status = 'error'
-            server.error_message = str(e)
-            await db.commit()
+        Returns:
+            One result dict per requested server, in request order
+        """
+        server_uuids = [_parse_server_id(server_id) for server_id in server_ids]
+        valid_uuids = [server_uuid for server_uuid in server_uuids if server_uuid]
+        
+        servers = {}
+        if valid_uuids:
+            stmt = select(MCPServer.id, MCPServer.server_type, MCPServer.config).where(
+                MCPServer.id.in_(valid_uuids)
+            )
+            result = await db.execute(stmt)
+            servers = {row.id: row for row in result.all()}
+        
+        targets = [servers.get(server_uuid) if server_uuid else None for server_uuid in server_uuids]
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def probe(server: Row) -> Dict[str, Any]:
+            async with semaphore:
+                connector = get_connector(server.server_type, server.config)
+                return await asyncio.to_thread(connector.test_connection)
+        
+        outcomes = iter(await asyncio.gather(
+            *(probe(server) for server in targets if server),
+            return_exceptions=True
+        ))
+        
+        results = []
+        for server_id, server in zip(server_ids, targets):
+            if not server:
+                results.append({"success": False, "server_id": server_id, "error": "Server not found"})
+                continue
+            results.append(await self._record_test_result(db, server_id, server, next(outcomes)))
+        
+        await db.commit()
+        
+        logger.info("mcp.test_connections_bulk", count=len(server_ids), concurrency=concurrency)
+        
+        return results
+    
+    async def _record_test_result(
+        self,
+        db: AsyncSession,
+        server_id: str,
+        server: Row,
+        outcome: Any
+    ) -> Dict[str, Any]:
+        """Stage the server status update for a probe outcome and build the response"""
+        status_stmt = update(MCPServer).where(MCPServer.id == server.id)
+        
+        if isinstance(outcome, BaseException):
+            logger.error("mcp.test_connection_failed", server_id=server_id, error=str(outcome))
+            
+            await db.execute(status_stmt.values(status='error', error_message=str(outcome)))
             
             return {
                 "success": False,
                 "server_id": server_id,
-                "error": str(e),
+                "error": str(outcome),
                 "message": "Connection test failed"
             }
+        
+        # Update server status based on result
+        if outcome['success']:
+            status_stmt = status_stmt.values(
+                status='active',
+                last_connected_at=datetime.utcnow(),
+                error_message=None
+            )
+        else:
+            status_stmt = status_stmt.values(
+                status='error',
+                error_message=outcome.get('error', 'Connection failed')
+            )
+        
+        await db.execute(status_stmt)
+        
+        return {
+            **outcome,
+            "server_id": server_id,
+            "server_type": server.server_type
+        }
     
     def connect_server(self, server_id: str) -> bool:
         """
@@ -282,14 +433,13 @@ class MCPServerManager:
         
         Note: Phase 1 skeleton - actual connection in Phase 2
         """
-        if server_id in self.active_servers:
+        # TODO: Phase 2 - Establish actual MCP connection
+        # For now, just mark as connected (single lookup via setdefault)
+        conn = _ActiveConn(connected_at=datetime.utcnow())
+        if self.active_servers.setdefault(server_id, conn) is not conn:
             logger.info("mcp.already_connected", server_id=server_id)
             return True
         
-        # TODO: Phase 2 - Establish actual MCP connection
-        # For now, just mark as connected
-        self.active_servers[server_id] = {"connected_at": datetime.utcnow()}
-        
         logger.info("mcp.connected", server_id=server_id)
         return True
     
@@ -299,11 +449,9 @@ class MCPServerManager:
         
         Note: Phase 1 skeleton - actual disconnection in Phase 2
         """
-        if server_id not in self.active_servers:
-            return True
-        
         # TODO: Phase 2 - Close actual MCP connection
-        del self.active_servers[server_id]
+        if self.active_servers.pop(server_id, None) is None:
+            return True
         
         logger.info("mcp.disconnected", server_id=server_id)
         return True
@@ -333,7 +481,7 @@ class MCPServerManager:
         
         # If refresh requested, discover resources from actual server
         if refresh:
-            server = await self.get_server(db, server_id)
+            server = await self._get_server_core(db, server_uuid)
             if server:
                 try:
                     # Get connector and discover resources
@@ -347,7 +495,8 @@ class MCPServerManager:
                     for resource in old_resources:
                         await db.delete(resource)
                     
-                    # Save newly discovered resources
+                    # Save newly discovered resources (one sync timestamp per batch)
+                    now = datetime.utcnow()
                     for res_data in discovered:
                         resource = MCPResource(
                             server_id=server_uuid,
@@ -356,7 +505,7 @@ class MCPServerManager:
                             name=res_data.get('name'),
                             description=res_data.get('description'),
                             metadata=res_data.get('metadata', {}),
-                            last_synced_at=datetime.utcnow()
+                            last_synced_at=now
                         )
                         db.add(resource)
                     
@@ -413,33 +562,20 @@ class MCPServerManager:
         Raises:
             ValueError: If configuration is invalid
         """
-        # Required fields per server type
-        required_fields = {
-            'github': ['token'],
-            'postgres': ['host', 'port', 'database', 'username', 'password'],
-            'filesystem': ['path'],
-            'sqlite': ['database_path'],
-            'gmail': [],  # No required fields - uses OAuth tokens from ~/.local/share/google-auth/
-        }
-        
-        if server_type not in required_fields:
+        required = _REQUIRED_FIELDS.get(server_type)
+        if required is None:
             logger.warning("mcp.unknown_server_type", type=server_type)
             return True  # Allow unknown types for flexibility
         
-        required = required_fields[server_type]
-        missing = [f for f in required if f not in config or not config[f]]
+        missing = [f for f in required if not config.get(f)]
         
         if missing:
             raise ValueError(f"Missing required fields for {server_type}: {', '.join(missing)}")
         
-        # Gmail-specific validation
-        if server_type == 'gmail':
-            # Validate accounts if provided
-            if 'accounts' in config and not isinstance(config['accounts'], list):
-                raise ValueError("Gmail 'accounts' must be a list")
-            # Set defaults if not provided
-            if 'default_account' not in config:
-                config['default_account'] = config.get('accounts', ['arvinda.reddy@gmail.com'])[0]
+        # Type-specific validation
+        validator = _VALIDATORS.get(server_type)
+        if validator:
+            validator(config)
         
         return True
 
@@ -11,21 +11,208 @@ Orchestrates the full conversational query flow:
 7. Visualization suggestion
 """
 from typing import Optional, Dict, Any, List, Tuple
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text, select
+from datetime import datetime, date
+from functools import cached_property
+from decimal import Decimal
+from uuid import UUID
+import asyncio
+import contextlib
+import re
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine
+from sqlalchemy import text, select, JSON
 import structlog
 
+from app.core.config import settings
+from app.models.base import AsyncSessionLocal
 from app.models.user import User
 from app.models.database import DatabaseConnection
 from app.models.session import MessageRole, MessageType
 from app.services.session_manager import SessionManager, get_session_manager
-from app.services.context_manager import get_context_manager
-from app.agents.sql_agent import get_sql_agent
+from app.services.context_manager import ContextManager, get_context_manager
+from app.agents.sql_agent import SQLAgent, get_sql_agent
 from app.services.discovery import DiscoveryService
 from app.services.cache import cache
+from app.services.database_connector import DatabaseConnectorFactory
+from app.services.encryption import encryption_service
 
 logger = structlog.get_logger(__name__)
 
+# Values of these types are already JSON-serializable and pass through as-is
+_JSON_NATIVE_TYPES = frozenset({str, int, float, bool})
+
+# Rows fetched per round trip when streaming query results
+_STREAM_BATCH_SIZE = 1000
+
+# Rows returned to the frontend / stored on the message; only these are serialized
+_MAX_DISPLAY_ROWS = 100
+
+# Schema cache lifetime, and the final stretch of it during which a cache hit
+# is re-checked against the live schema (see _generate_sql_speculatively)
+_SCHEMA_TTL = 3600
+_SCHEMA_REFRESH_WINDOW = 300
+
+# Schema lookups in progress, keyed by data source ID (see _get_schema_info)
+_schema_inflight: Dict[int, asyncio.Future] = {}
+
+# Pooled async engines for PostgreSQL data sources, keyed by data source ID.
+# The encrypted connection string is kept to detect edited connections
+_engines: Dict[int, Tuple[str, AsyncEngine]] = {}
+
+# Column metadata as one JSON document ({"schema.table": {"columns": [...]}}),
+# built by PostgreSQL. Capped at the first 1000 columns
+_PG_SCHEMA_QUERY = text("""
+    SELECT json_object_agg(
+        table_schema || '.' || table_name,
+        json_build_object('columns', columns)
+        ORDER BY table_schema, table_name
+    ) AS schema
+    FROM (
+        SELECT
+            table_schema,
+            table_name,
+            json_agg(
+                json_build_object(
+                    'name', column_name,
+                    'type', data_type,
+                    'nullable', is_nullable = 'YES'
+                )
+                ORDER BY ordinal_position
+            ) AS columns
+        FROM (
+            SELECT table_schema, table_name, column_name, data_type, is_nullable, ordinal_position
+            FROM information_schema.columns
+            WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
+            ORDER BY table_schema, table_name, ordinal_position
+            LIMIT 1000
+        ) c
+        GROUP BY table_schema, table_name
+    ) t
+""").columns(schema=JSON)
+
+# Row-per-column fallback for data sources without an async driver
+_SCHEMA_ROWS_SQL = """
+    SELECT
+        table_schema AS table_schema,
+        table_name AS table_name,
+        column_name AS column_name,
+        data_type AS data_type,
+        is_nullable AS is_nullable
+    FROM information_schema.columns
+    WHERE table_schema NOT IN (
+        'pg_catalog', 'information_schema', 'mysql', 'performance_schema', 'sys'
+    )
+    ORDER BY table_schema, table_name, ordinal_position
+    LIMIT 1000
+"""
+
+# SQL keywords the visualization / suggestion heuristics look for. Substring
+# matches, like the original `in` checks ("timestamp" is covered by "time")
+_SQL_TOKENS = re.compile(r"(date|time|group\s+by|count\(|limit)", re.IGNORECASE)
+
+
+def _sql_tokens(sql_query: str) -> frozenset:
+    """Scan SQL once and return the heuristic keywords it contains"""
+    return frozenset(
+        "group by" if match[0][0] in "gG" else match[0].lower()
+        for match in _SQL_TOKENS.finditer(sql_query)
+    )
+
+
+def _build_suggestions(grouped: bool, limited: bool, time_filtered: bool) -> Tuple[str, ...]:
+    """Follow-up suggestions for a query with the given SQL features"""
+    suggestions = []
+    
+    # If not grouped, suggest grouping
+    if not grouped:
+        suggestions.append("Show me by category")
+        suggestions.append("Break this down by region")
+    
+    # If no limit, suggest top N
+    if not limited:
+        suggestions.append("Show me top 10")
+    
+    # If no time filter, suggest time-based
+    if not time_filtered:
+        suggestions.append("Show me for this year")
+        suggestions.append("Compare to last month")
+    
+    # Always offer export
+    suggestions.append("Export these results")
+    
+    return tuple(suggestions[:3])  # Max 3 suggestions
+
+
+# Suggestions keyed by feature bits: 1 = GROUP BY, 2 = LIMIT, 4 = date/time filter
+_SUGGESTION_TABLE: Dict[int, Tuple[str, ...]] = {
+    flags: _build_suggestions(bool(flags & 1), bool(flags & 2), bool(flags & 4))
+    for flags in range(8)
+}
+
+async def _get_data_source_engine(data_source: DatabaseConnection) -> AsyncEngine:
+    """Pooled async engine for a PostgreSQL data source, created on first use"""
+    entry = _engines.get(data_source.id)
+    if entry is not None:
+        encrypted_url, engine = entry
+        if encrypted_url == data_source.connection_string:
+            return engine
+        # Connection was edited since the engine was built
+        await engine.dispose()
+    
+    url = encryption_service.decrypt(data_source.connection_string)
+    _, sep, rest = url.partition("://")
+    engine = create_async_engine(
+        f"postgresql+asyncpg{sep}{rest}",
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True
+    )
+    _engines[data_source.id] = (data_source.connection_string, engine)
+    return engine
+
+
+def _fetch_schema_rows_sync(data_source: DatabaseConnection) -> Dict[str, Any]:
+    """Read column metadata through the blocking connector (non-PostgreSQL sources)"""
+    connector = DatabaseConnectorFactory.create(
+        encryption_service.decrypt(data_source.connection_string)
+    )
+    try:
+        connector.connect()
+        rows = connector.execute_query(_SCHEMA_ROWS_SQL)
+    finally:
+        connector.disconnect()
+    
+    schema = {}
+    for row in rows:
+        table_key = f"{row['table_schema']}.{row['table_name']}"
+        if table_key not in schema:
+            schema[table_key] = {"columns": []}
+        
+        schema[table_key]["columns"].append({
+            "name": row["column_name"],
+            "type": row["data_type"],
+            "nullable": row["is_nullable"] == "YES"
+        })
+    
+    return schema
+
+
+def _execute_query_sync(
+    data_source: DatabaseConnection,
+    sql_query: str,
+    max_rows: int
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run a query through the blocking connector (non-PostgreSQL sources)"""
+    connector = DatabaseConnectorFactory.create(
+        encryption_service.decrypt(data_source.connection_string)
+    )
+    try:
+        connector.connect()
+        rows = connector.execute_query(sql_query)
+    finally:
+        connector.disconnect()
+    
+    return rows[:max_rows], len(rows) > max_rows
+
 
 class QueryOrchestrator:
     """
@@ -48,10 +235,18 @@ class QueryOrchestrator:
         self.db = db
         self.user = user
         self.session_manager = get_session_manager(db)
-        self.context_manager = get_context_manager(db, cache)
-        self.sql_agent = get_sql_agent(db)
         self.discovery_service = DiscoveryService(db)
     
+    @cached_property
+    def context_manager(self) -> ContextManager:
+        """Context manager, built on first use (query path only)"""
+        return get_context_manager(self.db, cache)
+    
+    @cached_property
+    def sql_agent(self) -> SQLAgent:
+        """SQL agent, built on first use (query path only)"""
+        return get_sql_agent(self.db)
+    
     async def process_message(
         self,
         message: str,
@@ -164,8 +359,31 @@ class QueryOrchestrator:
                 "data_sources": []
             }
         
-        # Format discovery response
-        response_content = self._format_discovery_response(discovery_results)
+        # Build the message text, stored suggestions and API payload in one pass
+        count = len(discovery_results)
+        parts = [f"I found {count} data source{'s' if count > 1 else ''} that might help:\n\n"]
+        stored_results = []
+        data_sources = []
+        
+        for ds in discovery_results:
+            if ds.description:
+                parts.append(f"• **{ds.display_name}** - {ds.description[:100]}\n")
+            else:
+                parts.append(f"• **{ds.display_name}**\n")
+            
+            stored_results.append((ds.id, ds.score if hasattr(ds, 'score') else 0))
+            data_sources.append({
+                "id": ds.id,
+                "name": ds.name,
+                "display_name": ds.display_name,
+                "description": ds.description,
+                "database_type": ds.database_type,
+                "keywords": ds.keywords,
+                "connection_status": ds.connection_status
+            })
+        
+        parts.append("\nPlease select a data source to continue.")
+        response_content = "".join(parts)
         
         # Store assistant message
         await self.session_manager.add_message(
@@ -173,35 +391,14 @@ class QueryOrchestrator:
             role=MessageRole.ASSISTANT,
             content=response_content,
             message_type=MessageType.DISCOVERY,
-            metadata={
-                "discovery_results": [
-                    {
-                        "id": ds.id,
-                        "name": ds.name,
-                        "display_name": ds.display_name,
-                        "score": ds.score if hasattr(ds, 'score') else 0
-                    }
-                    for ds in discovery_results
-                ]
-            }
+            discovery_results=stored_results
         )
         
         return {
             "session_id": session.id,
             "message_type": "discovery",
             "content": response_content,
-            "data_sources": [
-                {
-                    "id": ds.id,
-                    "name": ds.name,
-                    "display_name": ds.display_name,
-                    "description": ds.description,
-                    "database_type": ds.database_type,
-                    "keywords": ds.keywords,
-                    "connection_status": ds.connection_status
-                }
-                for ds in discovery_results
-            ]
+            "data_sources": data_sources
         }
     
     async def _handle_query(
@@ -212,6 +409,10 @@ class QueryOrchestrator:
         """Handle SQL query generation and execution"""
         logger.info("query.sql_generation", session_id=session.id)
         
+        # Conversation context does not depend on the data source, so load it
+        # concurrently with the data source / schema lookups below
+        history_task = asyncio.create_task(self._get_history_context(session.id))
+        
         try:
             # Get data source
             data_source = await self._get_data_source(session.data_source_id)
@@ -222,14 +423,26 @@ class QueryOrchestrator:
                     "DATA_SOURCE_NOT_FOUND"
                 )
             
-            # Get schema information
-            schema_info = await self._get_schema_info(data_source)
-            
             # Get conversation context
-            conversation_context = await self.session_manager.get_context_from_history(
-                session.id,
-                last_n_messages=5
-            )
+            conversation_context = await history_task
+            
+            # Generate SQL using context-aware agent. Schema keys are versioned,
+            # so invalidate_schema shows up here as a miss. A hit about to
+            # expire is re-checked while the LLM call already runs on it
+            cached_schema, ttl = await cache.get_schema_info_with_ttl(data_source.id)
+            if cached_schema is None:
+                schema_info = await self._get_schema_info(data_source)
+                sql_result = await self._generate_sql(
+                    message, data_source, schema_info, conversation_context
+                )
+            elif ttl < _SCHEMA_REFRESH_WINDOW:
+                sql_result = await self._generate_sql_speculatively(
+                    message, data_source, cached_schema, conversation_context
+                )
+            else:
+                sql_result = await self._generate_sql(
+                    message, data_source, cached_schema, conversation_context
+                )
             
             # Get business context
             context_result = await self.context_manager.get_context_for_query(
@@ -241,16 +454,6 @@ class QueryOrchestrator:
                 use_cache=True
             )
             
-            # Generate SQL using context-aware agent
-            sql_result = await self.sql_agent.generate_query(
-                question=message,
-                schema=schema_info,
-                database_type=data_source.database_type,
-                database_id=data_source.id,
-                user_permissions={"role": self.user.role, "user_id": self.user.id},
-                conversation_history=conversation_context.get("conversation_summary", [])
-            )
-            
             if not sql_result.get("success"):
                 return await self._error_response(
                     session,
@@ -262,9 +465,12 @@ class QueryOrchestrator:
             sql_explanation = sql_result.get("explanation", "")
             
             # Execute query
-            results, error = await self._execute_query(data_source, sql_query)
+            results, truncated, error = await self._execute_query(data_source, sql_query)
             
             if error:
+                if "does not exist" in error:
+                    # Missing table/column: the cached schema is likely stale
+                    await cache.invalidate_schema(data_source.id)
                 return await self._error_response(
                     session,
                     f"Query execution failed: {error}",
@@ -272,11 +478,10 @@ class QueryOrchestrator:
                     sql_query=sql_query
                 )
             
-            # Suggest visualization
-            viz_config = self._suggest_visualization(results, sql_query)
-            
-            # Generate suggested follow-ups
-            suggested_actions = self._generate_suggestions(results, sql_query, message)
+            # Suggest visualization and follow-ups from a single keyword scan
+            sql_tokens = _sql_tokens(sql_query)
+            viz_config = self._suggest_visualization(results, sql_tokens)
+            suggested_actions = self._generate_suggestions(results, sql_tokens, message)
             
             # Format response
             response_content = self._format_query_response(
@@ -284,7 +489,10 @@ class QueryOrchestrator:
                 sql_explanation
             )
             
-            # Store assistant message
+            # Only the rows that leave this process need JSON-safe values
+            display_results = self._serialize_rows(results[:_MAX_DISPLAY_ROWS])
+            
+            # Store assistant message and update session context in one commit
             await self.session_manager.add_message(
                 session_id=session.id,
                 role=MessageRole.ASSISTANT,
@@ -292,16 +500,12 @@ class QueryOrchestrator:
                 message_type=MessageType.QUERY_RESULT,
                 sql_query=sql_query,
                 sql_explanation=sql_explanation,
-                results=results,
+                results=display_results,
+                result_count=len(results),
                 visualization_config=viz_config,
                 context_stats=context_result.get("stats"),
-                suggested_actions=suggested_actions
-            )
-            
-            # Update session context
-            await self.session_manager.update_session_context(
-                session.id,
-                {
+                suggested_actions=suggested_actions,
+                context_updates={
                     "last_tables": list(conversation_context.get("tables_used", [])),
                     "last_query": sql_query
                 }
@@ -311,6 +515,7 @@ class QueryOrchestrator:
                 "query.success",
                 session_id=session.id,
                 result_count=len(results),
+                truncated=truncated,
                 viz_type=viz_config.get("type") if viz_config else None
             )
             
@@ -320,8 +525,9 @@ class QueryOrchestrator:
                 "content": response_content,
                 "sql_query": sql_query,
                 "sql_explanation": sql_explanation,
-                "results": results[:100],  # Limit frontend results
+                "results": display_results,  # Limit frontend results
                 "result_count": len(results),
+                "truncated": truncated,
                 "visualization": viz_config,
                 "suggested_actions": suggested_actions,
                 "context_stats": context_result.get("stats")
@@ -334,80 +540,226 @@ class QueryOrchestrator:
                 f"An unexpected error occurred: {str(e)}",
                 "UNEXPECTED_ERROR"
             )
+        finally:
+            # No-op once awaited; stops the lookup on early returns. Awaiting it
+            # retrieves any exception and lets its DB session close now
+            history_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await history_task
+    
+    async def _get_history_context(self, session_id: int) -> Dict[str, Any]:
+        """
+        Extract conversation context on a dedicated DB session.
+        
+        An AsyncSession does not support concurrent operations, so running this
+        alongside other queries on self.db requires its own session.
+        """
+        async with AsyncSessionLocal() as db:
+            return await get_session_manager(db).get_context_from_history(
+                session_id,
+                last_n_messages=5
+            )
     
     async def _get_data_source(self, data_source_id: int) -> Optional[DatabaseConnection]:
-        """Get data source by ID"""
-        query = select(DatabaseConnection).where(Database.id == data_source_id)
+        """Get an active data source by ID, or None if missing or not accessible"""
+        query = select(DatabaseConnection).where(
+            DatabaseConnection.id == data_source_id,
+            DatabaseConnection.is_active == True
+        )
         result = await self.db.execute(query)
-        return result.scalar_one_or_none()
+        data_source = result.scalar_one_or_none()
+        
+        if data_source and not data_source.is_accessible_by(self.user):
+            logger.warning(
+                "query.data_source_forbidden",
+                user_id=self.user.id,
+                data_source_id=data_source_id
+            )
+            return None
+        
+        return data_source
     
-    async def _get_schema_info(self, data_source: DatabaseConnection) -> Dict[str, Any]:
-        """Get schema information for data source"""
-        # Simplified schema retrieval - in production, use full schema service
+    async def _generate_sql(
+        self,
+        message: str,
+        data_source: DatabaseConnection,
+        schema_info: Dict[str, Any],
+        conversation_context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Generate SQL for the message against the given schema"""
+        return await self.sql_agent.generate_query(
+            question=message,
+            schema=schema_info,
+            database_type=data_source.database_type,
+            database_id=data_source.id,
+            user_permissions={"role": self.user.role, "user_id": self.user.id},
+            conversation_history=conversation_context.get("conversation_summary", [])
+        )
+    
+    async def _generate_sql_speculatively(
+        self,
+        message: str,
+        data_source: DatabaseConnection,
+        cached_schema: Dict[str, Any],
+        conversation_context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Generate SQL from a nearly expired cached schema while refreshing it.
+        
+        The LLM call dominates latency, so it starts immediately on the cached
+        schema and the live schema is reloaded through _get_schema_info
+        meanwhile (coalesced, and re-cached with a full TTL). If the two differ,
+        the speculative result is discarded and SQL is generated again from
+        the fresh schema.
+        """
+        spec_task = asyncio.create_task(
+            self._generate_sql(message, data_source, cached_schema, conversation_context)
+        )
         try:
-            query = text("""
-                SELECT 
-                    table_schema,
-                    table_name,
-                    column_name,
-                    data_type,
-                    is_nullable
-                FROM information_schema.columns
-                WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
-                ORDER BY table_schema, table_name, ordinal_position
-                LIMIT 1000
-            """)
+            fresh_schema = await self._get_schema_info(data_source)
             
-            result = await self.db.execute(query)
-            rows = result.fetchall()
+            # An empty schema means the refresh failed (already logged)
+            if not fresh_schema or fresh_schema == cached_schema:
+                return await spec_task
             
-            schema = {}
-            for row in rows:
-                table_key = f"{row[0]}.{row[1]}"
-                if table_key not in schema:
-                    schema[table_key] = {"columns": []}
-                
-                schema[table_key]["columns"].append({
-                    "name": row[2],
-                    "type": row[3],
-                    "nullable": row[4] == "YES"
-                })
+            # Schema changed: let the speculative call unwind before starting over
+            spec_task.cancel()
+            await asyncio.gather(spec_task, return_exceptions=True)
+            logger.info("query.speculation_discarded", database_id=data_source.id)
             
+            return await self._generate_sql(
+                message, data_source, fresh_schema, conversation_context
+            )
+        finally:
+            # No-op once awaited; stops the LLM call if we are cancelled
+            spec_task.cancel()
+    
+    async def _get_schema_info(self, data_source: DatabaseConnection) -> Dict[str, Any]:
+        """
+        Load schema information for data source and cache it (on a cache miss).
+        
+        Concurrent misses for the same data source are coalesced: the first
+        caller runs the query and the others await its result.
+        """
+        while (inflight := _schema_inflight.get(data_source.id)) is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Re-raise our own cancellation; if the leader was cancelled, retry
+                if not inflight.cancelled():
+                    raise
+        
+        future = asyncio.get_running_loop().create_future()
+        _schema_inflight[data_source.id] = future
+        try:
+            try:
+                version = await cache.get_schema_version(data_source.id)
+                schema = await self._fetch_schema_info(data_source)
+                await cache.set_schema_info(
+                    data_source.id, schema, ttl=_SCHEMA_TTL, version=version
+                )
+            except Exception as e:
+                logger.error("schema.retrieval_failed", error=str(e))
+                schema = {}
+            future.set_result(schema)
             return schema
-            
-        except Exception as e:
-            logger.error("schema.retrieval_failed", error=str(e))
-            return {}
+        finally:
+            _schema_inflight.pop(data_source.id, None)
+            if not future.done():
+                future.cancel()
+    
+    @staticmethod
+    async def _fetch_schema_info(data_source: DatabaseConnection) -> Dict[str, Any]:
+        """Read column metadata from the data source's own information_schema"""
+        if data_source.database_type != "postgresql":
+            # No async driver for other databases; keep the blocking connector off the loop
+            return await asyncio.to_thread(_fetch_schema_rows_sync, data_source)
+        
+        engine = await _get_data_source_engine(data_source)
+        async with engine.connect() as conn:
+            result = await conn.execute(_PG_SCHEMA_QUERY)
+            return result.scalar() or {}
     
     async def _execute_query(
         self,
         data_source: DatabaseConnection,
         sql_query: str
-    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-        """Execute SQL query"""
+    ) -> Tuple[List[Dict[str, Any]], bool, Optional[str]]:
+        """
+        Execute SQL query on the data source it was generated for.
+        
+        Uses the same engine / connector as _fetch_schema_info. For PostgreSQL,
+        rows are streamed from a server-side cursor and fetching stops once
+        settings.max_result_rows is reached, so oversized results are never
+        fully materialized.
+        
+        Returns:
+            (results, truncated, error) - truncated is True when the row cap was hit
+        """
+        max_rows = settings.max_result_rows
         try:
-            result = await self.db.execute(text(sql_query))
-            rows = result.fetchall()
-            columns = result.keys()
+            if data_source.database_type != "postgresql":
+                results, truncated = await asyncio.to_thread(
+                    _execute_query_sync, data_source, sql_query, max_rows
+                )
+                return results, truncated, None
+            
+            engine = await _get_data_source_engine(data_source)
+            async with engine.connect() as conn:
+                result = await conn.stream(
+                    text(sql_query).execution_options(yield_per=_STREAM_BATCH_SIZE)
+                )
+                columns = tuple(result.keys())
+                
+                rows = []
+                truncated = False
+                async for partition in result.partitions():
+                    rows.extend(partition)
+                    if len(rows) >= max_rows:
+                        truncated = len(rows) > max_rows or await result.fetchone() is not None
+                        del rows[max_rows:]
+                        break
+                await result.close()
             
-            # Convert to list of dicts
-            results = [
-                {col: self._serialize_value(val) for col, val in zip(columns, row)}
-                for row in rows
-            ]
+            # Raw values; serialization happens in _serialize_rows for the
+            # rows that are actually returned / stored
+            results = [dict(zip(columns, row)) for row in rows]
             
-            return results, None
+            return results, truncated, None
             
         except Exception as e:
             logger.error("query.execution_error", error=str(e), sql=sql_query)
-            return [], str(e)
+            return [], False, str(e)
+    
+    def _serialize_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Make result rows JSON-safe, converting only the columns that need it.
+        
+        Result columns are typed, so each column's serializer is picked from its
+        first non-null value; JSON-native (or all-null) columns pass through.
+        """
+        if not rows:
+            return rows
+        
+        converters = {}
+        for col in rows[0]:
+            sample = next((row[col] for row in rows if row[col] is not None), None)
+            if sample is not None and type(sample) not in _JSON_NATIVE_TYPES:
+                converters[col] = self._serialize_value
+        
+        if not converters:
+            return rows
+        
+        return [
+            {
+                col: converters[col](val) if col in converters and val is not None else val
+                for col, val in row.items()
+            }
+            for row in rows
+        ]
     
     def _serialize_value(self, value: Any) -> Any:
         """Serialize value for JSON"""
-        from datetime import datetime, date
-        from decimal import Decimal
-        from uuid import UUID
-        
         if isinstance(value, (datetime, date)):
             return value.isoformat()
         elif isinstance(value, Decimal):
@@ -421,18 +773,16 @@ class QueryOrchestrator:
     def _suggest_visualization(
         self,
         results: List[Dict[str, Any]],
-        sql_query: str
+        sql_tokens: frozenset
     ) -> Optional[Dict[str, Any]]:
         """Suggest visualization configuration"""
-        if not results or len(results) == 0:
+        if not results:
             return None
         
         num_rows = len(results)
-        num_cols = len(results[0].keys()) if results else 0
-        sql_lower = sql_query.lower()
         
         # Time series detection
-        if any(keyword in sql_lower for keyword in ["date", "time", "timestamp"]) and num_rows > 2:
+        if ("date" in sql_tokens or "time" in sql_tokens) and num_rows > 2:
             return {
                 "type": "line_chart",
                 "title": "Trend Over Time",
@@ -440,7 +790,7 @@ class QueryOrchestrator:
             }
         
         # Group by → bar chart
-        if "group by" in sql_lower and num_rows <= 20:
+        if "group by" in sql_tokens and num_rows <= 20:
             return {
                 "type": "bar_chart",
                 "title": "Comparison",
@@ -448,7 +798,7 @@ class QueryOrchestrator:
             }
         
         # Count → bar chart
-        if "count(" in sql_lower:
+        if "count(" in sql_tokens:
             return {
                 "type": "bar_chart",
                 "title": "Count Distribution",
@@ -465,53 +815,19 @@ class QueryOrchestrator:
     def _generate_suggestions(
         self,
         results: List[Dict[str, Any]],
-        sql_query: str,
+        sql_tokens: frozenset,
         original_question: str
-    ) -> List[str]:
+    ) -> Tuple[str, ...]:
         """Generate suggested follow-up actions"""
-        suggestions = []
-        
-        if len(results) > 0:
-            sql_lower = sql_query.lower()
-            
-            # If not grouped, suggest grouping
-            if "group by" not in sql_lower:
-                suggestions.append("Show me by category")
-                suggestions.append("Break this down by region")
-            
-            # If no limit, suggest top N
-            if "limit" not in sql_lower:
-                suggestions.append("Show me top 10")
-            
-            # If no time filter, suggest time-based
-            if "date" not in sql_lower and "time" not in sql_lower:
-                suggestions.append("Show me for this year")
-                suggestions.append("Compare to last month")
-            
-            # Always offer export
-            suggestions.append("Export these results")
+        if not results:
+            return ()
         
-        return suggestions[:3]  # Max 3 suggestions
-    
-    def _format_discovery_response(
-        self,
-        data_sources: List[DatabaseConnection]
-    ) -> str:
-        """Format discovery response message"""
-        if len(data_sources) == 0:
-            return "I couldn't find any data sources matching your query."
-        
-        count = len(data_sources)
-        response = f"I found {count} data source{'s' if count > 1 else ''} that might help:\n\n"
-        
-        for ds in data_sources:
-            response += f"• **{ds.display_name}**"
-            if ds.description:
-                response += f" - {ds.description[:100]}"
-            response += "\n"
-        
-        response += "\nPlease select a data source to continue."
-        return response
+        flags = (
+            ("group by" in sql_tokens)
+            | ("limit" in sql_tokens) << 1
+            | ("date" in sql_tokens or "time" in sql_tokens) << 2
+        )
+        return _SUGGESTION_TABLE[flags]
     
     def _format_query_response(
         self,
@@ -524,19 +840,19 @@ class QueryOrchestrator:
         if count == 0:
             return "I executed your query but didn't find any results."
         
-        response = f"I found {count} result{'s' if count != 1 else ''}.\n\n"
+        parts = [f"I found {count} result{'s' if count != 1 else ''}.\n\n"]
         
         if explanation:
-            response += f"{explanation}\n\n"
+            parts.append(f"{explanation}\n\n")
         
         # Add quick summary for small result sets
         if count <= 3 and results:
-            response += "Here's what I found:\n"
+            parts.append("Here's what I found:\n")
             for i, row in enumerate(results[:3], 1):
                 row_str = ", ".join([f"{k}: {v}" for k, v in list(row.items())[:3]])
-                response += f"{i}. {row_str}\n"
+                parts.append(f"{i}. {row_str}\n")
         
-        return response
+        return "".join(parts)
     
     async def _error_response(
         self,
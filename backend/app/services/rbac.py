@@ -4,7 +4,7 @@ Manage permissions and access control.
 """
 
 from enum import Enum
-from typing import List
+from typing import FrozenSet
 
 from fastapi import HTTPException, status
 
@@ -40,8 +40,8 @@ class Permission(str, Enum):
 
 
 # Role → Permissions mapping
-ROLE_PERMISSIONS: dict[Role, List[Permission]] = {
-    Role.ADMIN: [
+ROLE_PERMISSIONS: dict[Role, FrozenSet[Permission]] = {
+    Role.ADMIN: frozenset([
         # All permissions
         Permission.CREATE_DATASOURCE,
         Permission.EDIT_DATASOURCE,
@@ -53,20 +53,31 @@ ROLE_PERMISSIONS: dict[Role, List[Permission]] = {
         Permission.EXPORT_DATA,
         Permission.MANAGE_USERS,
         Permission.VIEW_ANALYTICS,
-    ],
-    Role.ANALYST: [
+    ]),
+    Role.ANALYST: frozenset([
         # Query and view, but no datasource management
         Permission.VIEW_DATASOURCE,
         Permission.EXECUTE_QUERY,
         Permission.VIEW_QUERY_HISTORY,
         Permission.EXPORT_DATA,
-    ],
-    Role.VIEWER: [
+    ]),
+    Role.VIEWER: frozenset([
         # Read-only access
         Permission.VIEW_DATASOURCE,
         Permission.EXECUTE_QUERY,
         Permission.VIEW_QUERY_HISTORY,
-    ],
+    ]),
+}
+
+# Bit position of each permission, and each role's permissions packed into an
+# int mask keyed by the raw role string stored on User. A permission check is
+# then one dict lookup and a bitwise AND, with no Role enum construction.
+_PERM_BIT: dict[Permission, int] = {
+    permission: 1 << i for i, permission in enumerate(Permission)
+}
+_ROLE_MASK: dict[str, int] = {
+    role.value: sum(_PERM_BIT[p] for p in perms)
+    for role, perms in ROLE_PERMISSIONS.items()
 }
 
 
@@ -89,15 +100,8 @@ class RBACService:
         if user.is_superuser:
             return True
         
-        # Get user's role
-        try:
-            role = Role(user.role)
-        except ValueError:
-            # Invalid role
-            return False
-        
-        # Check if role has permission
-        return permission in ROLE_PERMISSIONS.get(role, [])
+        # Unknown roles and permissions map to an empty mask (denied)
+        return bool(_ROLE_MASK.get(user.role, 0) & _PERM_BIT.get(permission, 0))
     
     @staticmethod
     def require_permission(user: User, permission: Permission) -> None:
@@ -4,8 +4,16 @@ Manages database schema metadata, documentation, and semantic search.
 Implements RAG (Retrieval Augmented Generation) for query generation.
 """
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 import structlog
 from sqlalchemy import inspect
 
@@ -14,6 +22,234 @@ from app.services.database_connector import DatabaseConnector, DatabaseConnector
 
 logger = structlog.get_logger()
 
+# Keys under which derived data is stored in the cached schema payload
+_TOKEN_INDEX_KEY = "_token_index"
+_FINGERPRINT_KEY = "_fingerprint"
+_FETCHED_AT_KEY = "_fetched_at"
+
+# Plain or schema-qualified table name accepted by get_table_sample
+_TABLE_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?")
+
+# Semantic table matching: tables returned per question, minimum cosine similarity
+_SEMANTIC_TOP_K = 5
+_SEMANTIC_MIN_SCORE = 0.3
+
+# Table samples are cheap to refetch but stable within a session
+_SAMPLE_TTL = 300
+
+# Schemas kept in process memory in front of Redis
+_LOCAL_SCHEMA_CACHE_SIZE = 64
+
+# Schema cache TTL, and the age after which a hit also refreshes in the background
+_SCHEMA_TTL = 3600  # 1 hour
+_SCHEMA_REFRESH_AFTER = 0.9 * _SCHEMA_TTL
+
+# Splits table/column names and questions into word tokens
+_TOKEN_SPLIT = re.compile(r"[\W_]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, with one trailing plural "s" stripped."""
+    return [
+        token[:-1] if len(token) > 3 and token.endswith("s") else token
+        for token in _TOKEN_SPLIT.split(text.lower())
+        if token
+    ]
+
+
+def _build_token_index(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build an inverted index from table/column names to table names.
+    
+    Args:
+        schema: Schema metadata dictionary
+        
+    Returns:
+        {"names": {space-joined name tokens: [table names]},
+         "max_words": longest name in tokens}
+    """
+    names: Dict[str, List[str]] = {}
+    max_words = 0
+    
+    for table_name, table_info in schema.get("tables", {}).items():
+        keys = {" ".join(_tokenize(table_name))}
+        keys.update(" ".join(_tokenize(col["name"])) for col in table_info.get("columns", []))
+        keys.discard("")
+        
+        for key in keys:
+            names.setdefault(key, []).append(table_name)
+            max_words = max(max_words, key.count(" ") + 1)
+    
+    return {"names": names, "max_words": max_words}
+
+
+def _format_table(table_name: str, table_info: Dict[str, Any]) -> str:
+    """Format one table's block of the schema summary."""
+    columns = "".join(
+        f"\n  - {col['name']} ({col['type']}){'' if col.get('nullable', True) else ' NOT NULL'}"
+        for col in table_info.get("columns", [])
+    )
+    block = f"\nTable: {table_name}\nColumns:{columns}"
+    
+    primary_keys = table_info.get("primary_keys")
+    if primary_keys:
+        block += f"\nPrimary Key: {', '.join(primary_keys)}"
+    
+    foreign_keys = table_info.get("foreign_keys")
+    if foreign_keys:
+        block += "\nForeign Keys:" + "".join(
+            f"\n  - {fk['columns']} -> {fk['referred_table']}.{fk['referred_columns']}"
+            for fk in foreign_keys
+        )
+    
+    return block
+
+
+def _format_tables(tables: Dict[str, Any]) -> str:
+    """Format table metadata as the schema summary used in LLM prompts."""
+    return "\n".join(
+        _format_table(table_name, table_info)
+        for table_name, table_info in tables.items()
+    )
+
+
+def _select_tables(tables: Dict[str, Any], table_names: Sequence[str]) -> Dict[str, Any]:
+    """Requested tables plus the tables they reference through foreign keys."""
+    # Filter to requested tables
+    filtered_tables = {
+        name: info
+        for name, info in tables.items()
+        if name in table_names
+    }
+    
+    # Add related tables (via foreign keys)
+    related_tables = set()
+    for table_info in filtered_tables.values():
+        for fk in table_info.get("foreign_keys", []):
+            related_table = fk.get("referred_table")
+            if related_table and related_table not in filtered_tables:
+                related_tables.add(related_table)
+    
+    # Include related tables
+    for related_table in related_tables:
+        if related_table in tables:
+            filtered_tables[related_table] = tables[related_table]
+    
+    return filtered_tables
+
+
+class _SchemaKey:
+    """Hashable handle on a fingerprinted schema, so formatting can be memoized."""
+
+    __slots__ = ("fingerprint", "tables")
+
+    def __init__(self, fingerprint: str, tables: Dict[str, Any]):
+        self.fingerprint = fingerprint
+        self.tables = tables
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _SchemaKey) and other.fingerprint == self.fingerprint
+
+
+@lru_cache(maxsize=128)
+def _cached_summary(schema_key: _SchemaKey, table_names: Optional[Tuple[str, ...]]) -> str:
+    """Summary of the whole schema, or of table_names and their FK targets."""
+    if table_names is None:
+        return _format_tables(schema_key.tables)
+    return _format_tables(_select_tables(schema_key.tables, table_names))
+
+
+def _table_document(table_name: str, table_info: Dict[str, Any]) -> str:
+    """Text embedded for a table: its name, columns and foreign-key targets."""
+    columns = ", ".join(col["name"] for col in table_info.get("columns", []))
+    document = f"{table_name}\nColumns: {columns}"
+    
+    referred = [fk["referred_table"] for fk in table_info.get("foreign_keys", []) if fk.get("referred_table")]
+    if referred:
+        document += f"\nFKs: {', '.join(referred)}"
+    
+    return document
+
+
+@lru_cache(maxsize=32)
+def _table_embeddings(
+    schema_key: _SchemaKey,
+) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray]:
+    """
+    Int8-quantized, unit-normalized embedding per table.
+    
+    Computed once per schema fingerprint, on the first question that reaches
+    semantic matching (in a worker thread, see _embed_question), so schema
+    loads and background refreshes never load the model. Each row is stored
+    as int8 with its own scale (row ~= int8_row * scale), a quarter of the
+    float32 footprint.
+    
+    Returns:
+        (table names, int8 matrix, float32 per-row scales)
+    """
+    # Imported lazily so loading this module does not load the embedding model
+    from app.services.embedding import get_embedding_service
+    
+    table_names = tuple(schema_key.tables)
+    if not table_names:
+        return table_names, np.empty((0, 0), dtype=np.int8), np.empty(0, dtype=np.float32)
+    
+    vectors = get_embedding_service().generate_embeddings_batch(
+        [_table_document(name, schema_key.tables[name]) for name in table_names],
+        return_numpy=True,
+    )
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+    quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return table_names, quantized, scales.astype(np.float32)
+
+
+def _embed_question(
+    question: str,
+    schema_key: _SchemaKey,
+) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray, np.ndarray]:
+    """Table embeddings (memoized) plus the question embedding (blocking)."""
+    from app.services.embedding import get_embedding_service
+    
+    table_names, quantized, scales = _table_embeddings(schema_key)
+    query = get_embedding_service().generate_embedding(question, return_numpy=True)
+    return table_names, quantized, scales, query
+
+
+def _extract_schema(connection_string: str) -> Dict[str, Any]:
+    """Connect, read the schema and annotate it for caching (blocking)."""
+    connector = DatabaseConnectorFactory.create(connection_string)
+    
+    try:
+        connector.connect()
+        schema = connector.get_schema()
+    finally:
+        connector.disconnect()
+    
+    schema[_FINGERPRINT_KEY] = hashlib.sha1(
+        json.dumps(schema, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    schema[_TOKEN_INDEX_KEY] = _build_token_index(schema)
+    schema[_FETCHED_AT_KEY] = time.time()
+    return schema
+
+
+def _sample_table(connection_string: str, table_name: str, limit: int) -> List[Dict[str, Any]]:
+    """Read the first rows of a validated table name (blocking)."""
+    connector = DatabaseConnectorFactory.create(connection_string)
+    
+    try:
+        connector.connect()
+        quote = connector.engine.dialect.identifier_preparer.quote
+        table = ".".join(quote(part) for part in table_name.split("."))
+        return connector.execute_query(f"SELECT * FROM {table} LIMIT {limit}")
+    finally:
+        connector.disconnect()
+
 
 class SchemaManager:
     """
@@ -27,7 +263,9 @@ class SchemaManager:
     """
 
     def __init__(self):
-        self._schema_cache: Dict[int, Dict] = {}
+        # database_id -> (schema cache version, schema), least recently used first
+        self._schema_cache: "OrderedDict[int, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._refresh_inflight: Dict[int, asyncio.Task] = {}
 
     async def get_schema(
         self,
@@ -38,6 +276,11 @@ class SchemaManager:
         """
         Get database schema with caching.
         
+        Schemas are looked up in process memory first, then in Redis; the
+        in-process copy is only used while its cache version is current. A
+        hit in the last 10% of its TTL is returned as-is while a background
+        task re-extracts the schema (stale-while-revalidate).
+        
         Args:
             database_id: Database connection ID
             connection_string: Database connection URL
@@ -48,78 +291,100 @@ class SchemaManager:
         """
         # Check cache first
         if not force_refresh:
-            cached_schema = await cache.get_schema(database_id)
+            version = await cache.get_schema_version(database_id)
+            cached_schema = self._get_local_schema(database_id, version)
+            if cached_schema is None:
+                cached_schema = await cache.get_schema(database_id, version=version)
+                if cached_schema:
+                    self._set_local_schema(database_id, version, cached_schema)
             if cached_schema:
                 logger.info(
                     "schema.cache_hit",
                     database_id=database_id,
                 )
+                fetched_at = cached_schema.get(_FETCHED_AT_KEY, 0)
+                if (
+                    time.time() - fetched_at > _SCHEMA_REFRESH_AFTER
+                    and database_id not in self._refresh_inflight
+                ):
+                    self._refresh_inflight[database_id] = asyncio.create_task(
+                        self._refresh_schema(database_id, connection_string)
+                    )
                 return cached_schema
 
-        # Connect and extract schema
-        connector = DatabaseConnectorFactory.create(connection_string)
+        return await self._load_schema(database_id, connection_string)
+
+    async def _load_schema(self, database_id: int, connection_string: str) -> Dict[str, Any]:
+        """Extract the schema off the event loop and cache it."""
+        version = await cache.get_schema_version(database_id)
+        schema = await asyncio.to_thread(_extract_schema, connection_string)
+        
+        # Cache the schema (with its fingerprint and token index)
+        await cache.set_schema(database_id, schema, ttl=_SCHEMA_TTL, version=version)
+        self._set_local_schema(database_id, version, schema)
+        
+        logger.info(
+            "schema.extracted",
+            database_id=database_id,
+            table_count=len(schema.get("tables", {})),
+        )
+        
+        return schema
+
+    def _get_local_schema(self, database_id: int, version: int) -> Optional[Dict[str, Any]]:
+        """In-process schema copy, if it matches the cache version and is within TTL."""
+        entry = self._schema_cache.get(database_id)
+        if entry is None:
+            return None
         
+        cached_version, schema = entry
+        if (
+            cached_version != version
+            or time.time() - schema.get(_FETCHED_AT_KEY, 0) > _SCHEMA_TTL
+        ):
+            del self._schema_cache[database_id]
+            return None
+        
+        self._schema_cache.move_to_end(database_id)
+        return schema
+
+    def _set_local_schema(self, database_id: int, version: int, schema: Dict[str, Any]) -> None:
+        """Keep a schema in process memory, evicting the least recently used."""
+        self._schema_cache[database_id] = (version, schema)
+        self._schema_cache.move_to_end(database_id)
+        if len(self._schema_cache) > _LOCAL_SCHEMA_CACHE_SIZE:
+            self._schema_cache.popitem(last=False)
+
+    async def _refresh_schema(self, database_id: int, connection_string: str) -> None:
+        """Background refresh for a cache entry close to expiry."""
         try:
-            connector.connect()
-            schema = connector.get_schema()
-            
-            # Cache the schema
-            await cache.set_schema(database_id, schema, ttl=3600)  # 1 hour
-            
-            logger.info(
-                "schema.extracted",
+            await self._load_schema(database_id, connection_string)
+        except Exception as e:
+            logger.warning(
+                "schema.refresh_failed",
                 database_id=database_id,
-                table_count=len(schema.get("tables", {})),
+                error=str(e),
             )
-            
-            return schema
-            
         finally:
-            connector.disconnect()
+            self._refresh_inflight.pop(database_id, None)
 
     def get_schema_summary(self, schema: Dict[str, Any]) -> str:
         """
         Generate human-readable schema summary for LLM prompts.
         
+        Schemas loaded through get_schema carry a fingerprint, and their
+        summaries are memoized on it.
+        
         Args:
             schema: Schema metadata dictionary
             
         Returns:
             Formatted schema description
         """
-        tables = schema.get("tables", {})
-        
-        summary_parts = []
-        
-        for table_name, table_info in tables.items():
-            # Table header
-            summary_parts.append(f"\nTable: {table_name}")
-            
-            # Columns
-            summary_parts.append("Columns:")
-            for col in table_info.get("columns", []):
-                col_desc = f"  - {col['name']} ({col['type']})"
-                if not col.get("nullable", True):
-                    col_desc += " NOT NULL"
-                summary_parts.append(col_desc)
-            
-            # Primary keys
-            primary_keys = table_info.get("primary_keys", [])
-            if primary_keys:
-                summary_parts.append(f"Primary Key: {', '.join(primary_keys)}")
-            
-            # Foreign keys
-            foreign_keys = table_info.get("foreign_keys", [])
-            if foreign_keys:
-                summary_parts.append("Foreign Keys:")
-                for fk in foreign_keys:
-                    fk_desc = (
-                        f"  - {fk['columns']} -> "
-                        f"{fk['referred_table']}.{fk['referred_columns']}"
-                    )
-                    summary_parts.append(fk_desc)
-        
-        return "\n".join(summary_parts)
+        fingerprint = schema.get(_FINGERPRINT_KEY)
+        if fingerprint is None:
+            return _format_tables(schema.get("tables", {}))
+        return _cached_summary(_SchemaKey(fingerprint, schema.get("tables", {})), None)
 
     def get_detailed_schema(
         self, 
@@ -136,32 +401,15 @@ class SchemaManager:
         Returns:
             Detailed schema description
         """
-        tables = schema.get("tables", {})
-        
-        # Filter to requested tables
-        filtered_tables = {
-            name: info
-            for name, info in tables.items()
-            if name in table_names
-        }
-        
-        # Add related tables (via foreign keys)
-        related_tables = set()
-        for table_info in filtered_tables.values():
-            for fk in table_info.get("foreign_keys", []):
-                related_table = fk.get("referred_table")
-                if related_table and related_table not in filtered_tables:
-                    related_tables.add(related_table)
-        
-        # Include related tables
-        for related_table in related_tables:
-            if related_table in tables:
-                filtered_tables[related_table] = tables[related_table]
-        
-        # Generate detailed description
-        return self.get_schema_summary({"tables": filtered_tables})
-
-    def find_relevant_tables(
+        fingerprint = schema.get(_FINGERPRINT_KEY)
+        if fingerprint is None:
+            return _format_tables(_select_tables(schema.get("tables", {}), table_names))
+        return _cached_summary(
+            _SchemaKey(fingerprint, schema.get("tables", {})),
+            tuple(sorted(set(table_names)))
+        )
+
+    async def find_relevant_tables(
         self, 
         question: str, 
         schema: Dict[str, Any]
@@ -169,8 +417,10 @@ class SchemaManager:
         """
         Find tables relevant to the user's question.
         
-        Uses simple keyword matching for now.
-        TODO: Integrate with vector store for semantic search.
+        Combines keyword matching (every run of question words is looked up in
+        the schema's token index) with semantic matching against per-table
+        embeddings for schemas loaded through get_schema. Embedding runs in a
+        worker thread, off the event loop.
         
         Args:
             question: Natural language question
@@ -179,24 +429,24 @@ class SchemaManager:
         Returns:
             List of relevant table names
         """
-        question_lower = question.lower()
         tables = schema.get("tables", {})
+        index = schema.get(_TOKEN_INDEX_KEY) or _build_token_index(schema)
+        names = index["names"]
         
-        relevant = []
+        tokens = _tokenize(question)
+        matched = set()
+        for width in range(1, min(index["max_words"], len(tokens)) + 1):
+            for start in range(len(tokens) - width + 1):
+                matched.update(names.get(" ".join(tokens[start:start + width]), ()))
         
-        for table_name, table_info in tables.items():
-            # Check table name
-            if table_name.lower() in question_lower:
-                relevant.append(table_name)
-                continue
-            
-            # Check column names
-            for col in table_info.get("columns", []):
-                col_name = col["name"].lower()
-                if col_name in question_lower or col_name.replace("_", " ") in question_lower:
-                    if table_name not in relevant:
-                        relevant.append(table_name)
-                    break
+        fingerprint = schema.get(_FINGERPRINT_KEY)
+        if fingerprint is not None and tables:
+            matched.update(
+                await self._semantic_matches(question, _SchemaKey(fingerprint, tables))
+            )
+        
+        # Keep schema order
+        relevant = [table_name for table_name in tables if table_name in matched]
         
         # If no matches, return all tables (for simple schemas)
         if not relevant and len(tables) <= 10:
@@ -211,30 +461,60 @@ class SchemaManager:
         
         return relevant
 
-    def get_table_sample(
+    async def _semantic_matches(self, question: str, schema_key: _SchemaKey) -> List[str]:
+        """Tables whose embedded description is closest to the question."""
+        try:
+            table_names, quantized, scales, query = await asyncio.to_thread(
+                _embed_question, question, schema_key
+            )
+        except Exception as e:
+            logger.warning("schema.semantic_search_failed", error=str(e))
+            return []
+        
+        norm = np.linalg.norm(query)
+        if not norm or not table_names:
+            return []
+        
+        scores = (quantized @ (query / norm)) * scales
+        top = np.argsort(-scores)[:_SEMANTIC_TOP_K]
+        return [table_names[i] for i in top if scores[i] >= _SEMANTIC_MIN_SCORE]
+
+    async def get_table_sample(
         self,
         connection_string: str,
         table_name: str,
         limit: int = 3,
+        database_id: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         Get sample rows from a table.
         
+        Table names must be plain (optionally schema-qualified) identifiers.
+        With a database_id, samples are cached for a few minutes.
+        
         Args:
             connection_string: Database connection URL
             table_name: Table to sample
             limit: Number of rows to return
+            database_id: Optional database connection ID, enables caching
             
         Returns:
             List of sample rows
         """
-        connector = DatabaseConnectorFactory.create(connection_string)
+        if not _TABLE_NAME_RE.fullmatch(table_name):
+            logger.warning("schema.sample_invalid_table", table_name=table_name)
+            return []
+        
+        cache_key = f"sample:{database_id}:{table_name}:{limit}"
+        if database_id is not None:
+            cached_rows = await cache.get(cache_key)
+            if cached_rows is not None:
+                return cached_rows
         
         try:
-            connector.connect()
-            sql = f"SELECT * FROM {table_name} LIMIT {limit}"
-            rows = connector.execute_query(sql)
-            return rows
+            rows = await asyncio.to_thread(
+                _sample_table, connection_string, table_name, int(limit)
+            )
         except Exception as e:
             logger.warning(
                 "schema.sample_failed",
@@ -242,8 +522,10 @@ class SchemaManager:
                 error=str(e),
             )
             return []
-        finally:
-            connector.disconnect()
+        
+        if database_id is not None:
+            await cache.set(cache_key, rows, ttl=_SAMPLE_TTL)
+        return rows
 
     async def store_successful_query(
         self,
@@ -5,8 +5,13 @@ Manages conversation sessions and messages.
 Provides session lifecycle management, context tracking, and persistence.
 """
 from typing import Optional, List, Dict, Any, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from sqlalchemy import select, and_, or_
+from functools import lru_cache
+import re
+import sys
+from sqlalchemy import select, update, case, and_, or_, func, insert, table, column
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import structlog
@@ -19,10 +24,88 @@ from app.models.session import (
     MessageType
 )
 from app.models.user import User
-from app.services.cache import cache
+from app.models.database import DatabaseConnection
 
 logger = structlog.get_logger(__name__)
 
+# History contexts keyed by (session_id, newest message, last_n_messages); a new
+# message changes the key, so entries never need explicit invalidation
+_HISTORY_CONTEXT_CACHE_SIZE = 256
+_history_context_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+# Table reference after FROM / JOIN (subqueries start with "(" and are skipped)
+_TABLE_REF = re.compile(r"\b(?:from|join)\s+([^\s(),;]+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def _extract_tables(sql_query: str) -> Tuple[str, ...]:
+    """Table names referenced by a SQL query, lowercased and interned (memoized per SQL text)"""
+    return tuple(sys.intern(match.lower()) for match in _TABLE_REF.findall(sql_query))
+
+
+def _new_message(
+    session_id: int,
+    role: MessageRole,
+    content: str,
+    message_type: MessageType = MessageType.USER_MESSAGE,
+    results: Optional[List[Dict[str, Any]]] = None,
+    result_count: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    **fields: Any
+) -> ConversationMessage:
+    """Build a message row; remaining fields map directly to columns"""
+    return ConversationMessage(
+        session_id=session_id,
+        role=role,
+        message_type=message_type,
+        content=content,
+        results=results[:100] if results else None,  # Limit stored results
+        result_count=result_count if result_count is not None else (
+            len(results) if results else None
+        ),
+        metadata=metadata or {},
+        created_at=datetime.utcnow(),
+        **fields
+    )
+
+
+def _title_for(role: MessageRole, content: str) -> Optional[str]:
+    """Session title derived from a user message (None for other roles)"""
+    if role != MessageRole.USER or len(content) == 0:
+        return None
+    return content[:100] + ("..." if len(content) > 100 else "")
+
+
+def _new_session(
+    user_id: int,
+    title: Optional[str],
+    data_source_id: Optional[int],
+    expires_in_hours: int
+) -> ConversationSession:
+    """Build an active session row (shared by create_session and create_sessions)"""
+    now = datetime.utcnow()
+    return ConversationSession(
+        user_id=user_id,
+        title=title,
+        data_source_id=data_source_id,
+        status=SessionStatus.ACTIVE,
+        context={},
+        metadata={},
+        started_at=now,
+        last_activity_at=now,
+        expires_at=now + timedelta(hours=expires_in_hours)
+    )
+
+
+# Data sources suggested by discovery messages (alembic revision 007)
+_discovery_results = table(
+    "message_discovery_results",
+    column("message_id"),
+    column("data_source_id"),
+    column("score"),
+    column("rank"),
+)
+
 
 class SessionManager:
     """
@@ -33,12 +116,15 @@ class SessionManager:
     - Add messages to sessions
     - Track session context and state
     - Session expiration and cleanup
-    - Redis caching for active sessions
+    - Per-request reuse of loaded sessions
     """
     
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.cache_ttl = 3600  # 1 hour cache
+        # Sessions already loaded through this manager's AsyncSession (one
+        # request); they are the identity-map objects a re-query would return.
+        # Only used while none of their attributes are expired
+        self._loaded: Dict[int, ConversationSession] = {}
     
     async def create_session(
         self,
@@ -59,24 +145,13 @@ class SessionManager:
         Returns:
             Created session
         """
-        session = ConversationSession(
-            user_id=user_id,
-            title=title,
-            data_source_id=data_source_id,
-            status=SessionStatus.ACTIVE,
-            context={},
-            metadata={},
-            started_at=datetime.utcnow(),
-            last_activity_at=datetime.utcnow(),
-            expires_at=datetime.utcnow() + timedelta(hours=expires_in_hours)
-        )
+        session = _new_session(user_id, title, data_source_id, expires_in_hours)
         
         self.db.add(session)
         await self.db.commit()
-        await self.db.refresh(session)
+        await self._refresh_if_expired(session)
         
-        # Cache the session
-        await self._cache_session(session)
+        self._loaded[session.id] = session
         
         logger.info(
             "session.created",
@@ -87,15 +162,64 @@ class SessionManager:
         
         return session
     
+    async def create_sessions(
+        self,
+        user_id: int,
+        count: int,
+        data_source_id: Optional[int] = None,
+        expires_in_hours: int = 24
+    ) -> List[ConversationSession]:
+        """
+        Create several untitled sessions for a user in one transaction.
+        
+        The flush sends them as one batched INSERT ... RETURNING.
+        
+        Args:
+            user_id: User ID
+            count: Number of sessions to create
+            data_source_id: Optional data source ID for every session
+            expires_in_hours: Session expiration time in hours
+            
+        Returns:
+            Created sessions
+        """
+        if count <= 0:
+            return []
+        
+        sessions = [
+            _new_session(user_id, None, data_source_id, expires_in_hours)
+            for _ in range(count)
+        ]
+        self.db.add_all(sessions)
+        await self.db.flush()
+        ids = [session.id for session in sessions]
+        await self.db.commit()
+        await self._reload_if_expired(ConversationSession, sessions, ids)
+        
+        self._loaded.update((session.id, session) for session in sessions)
+        
+        logger.info(
+            "sessions.created",
+            user_id=user_id,
+            count=count
+        )
+        
+        return sessions
+    
     async def get_session(
         self,
         session_id: int,
         user_id: Optional[int] = None,
-        load_messages: bool = True
+        load_messages: bool = False
     ) -> Optional[ConversationSession]:
         """
         Get session by ID.
         
+        Loaded messages have their stored result rows deferred; use
+        get_session_history when the rows themselves are needed. Without
+        messages, a session this manager already loaded is returned without
+        another query.
+        
         Args:
             session_id: Session ID
             user_id: Optional user ID for access control
@@ -104,12 +228,16 @@ class SessionManager:
         Returns:
             Session or None
         """
-        # Try cache first
-        cache_key = f"session:v1:{session_id}"
-        cached = await cache.get(cache_key)
-        
-        if cached and not load_messages:
-            return cached
+        if not load_messages:
+            known = self._loaded.get(session_id)
+            # Any expired attribute (e.g. title after _touch_session's CASE
+            # update) would lazy-load, so such sessions are re-queried
+            if (
+                known is not None
+                and not sa_inspect(known).expired_attributes
+                and not known.is_expired
+            ):
+                return known if not user_id or known.user_id == user_id else None
         
         # Load from database
         query = select(ConversationSession).where(
@@ -120,7 +248,9 @@ class SessionManager:
             query = query.where(ConversationSession.user_id == user_id)
         
         if load_messages:
-            query = query.options(selectinload(ConversationSession.messages))
+            query = query.options(
+                selectinload(ConversationSession.messages).defer(ConversationMessage.results)
+            )
         
         result = await self.db.execute(query)
         session = result.scalar_one_or_none()
@@ -132,8 +262,7 @@ class SessionManager:
                 await self.db.commit()
                 await self.db.refresh(session)
             
-            # Update cache
-            await self._cache_session(session)
+            self._loaded[session.id] = session
         
         return session
     
@@ -180,16 +309,26 @@ class SessionManager:
         sql_query: Optional[str] = None,
         sql_explanation: Optional[str] = None,
         results: Optional[List[Dict[str, Any]]] = None,
+        result_count: Optional[int] = None,
         visualization_config: Optional[Dict[str, Any]] = None,
         context_stats: Optional[Dict[str, Any]] = None,
         suggested_actions: Optional[List[str]] = None,
         error_message: Optional[str] = None,
         error_code: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        context_updates: Optional[Dict[str, Any]] = None,
+        discovery_results: Optional[List[Tuple[int, float]]] = None
     ) -> ConversationMessage:
         """
         Add message to session.
         
+        If context_updates is given, the session context is updated in the same
+        transaction (one session lookup and one commit instead of a separate
+        update_session_context call).
+        
+        discovery_results are written to message_discovery_results with a
+        single multi-row INSERT rather than embedded in the message metadata.
+        
         Args:
             session_id: Session ID
             role: Message role (user/assistant/system)
@@ -198,50 +337,70 @@ class SessionManager:
             sql_query: Optional SQL query
             sql_explanation: Optional SQL explanation
             results: Optional query results
+            result_count: Optional total row count (defaults to len(results))
             visualization_config: Optional viz config
             context_stats: Optional context stats
             suggested_actions: Optional follow-up suggestions
             error_message: Optional error message
             error_code: Optional error code
             metadata: Optional metadata
+            context_updates: Optional session context updates
+            discovery_results: Optional (data_source_id, score) pairs, best first
             
         Returns:
             Created message
         """
-        message = ConversationMessage(
+        message = _new_message(
             session_id=session_id,
             role=role,
             message_type=message_type,
             content=content,
             sql_query=sql_query,
             sql_explanation=sql_explanation,
-            results=results[:100] if results else None,  # Limit stored results
-            result_count=len(results) if results else None,
+            results=results,
+            result_count=result_count,
             visualization_config=visualization_config,
             context_stats=context_stats,
             suggested_actions=suggested_actions,
             error_message=error_message,
             error_code=error_code,
-            metadata=metadata or {},
-            created_at=datetime.utcnow()
+            metadata=metadata
         )
         
         self.db.add(message)
         
-        # Update session last activity
-        session = await self.get_session(session_id, load_messages=False)
-        if session:
-            session.last_activity_at = datetime.utcnow()
-            
-            # Auto-generate title from first user message
-            if not session.title and role == MessageRole.USER and len(content) > 0:
-                session.title = content[:100] + ("..." if len(content) > 100 else "")
+        if discovery_results:
+            # Flush to get message.id, then insert all suggestions in one executemany
+            await self.db.flush()
+            await self.db.execute(
+                insert(_discovery_results),
+                [
+                    {
+                        "message_id": message.id,
+                        "data_source_id": data_source_id,
+                        "score": score,
+                        "rank": rank
+                    }
+                    for rank, (data_source_id, score) in enumerate(discovery_results)
+                ]
+            )
         
-        await self.db.commit()
-        await self.db.refresh(message)
+        # Auto-generate title from first user message
+        new_title = _title_for(role, content)
         
-        # Invalidate session cache
-        await self._invalidate_session_cache(session_id)
+        if context_updates:
+            # Merging context needs the current value, so load the session
+            session = await self.get_session(session_id, load_messages=False)
+            if session:
+                session.last_activity_at = datetime.utcnow()
+                if not session.title and new_title:
+                    session.title = new_title
+                session.update_context(context_updates)
+        else:
+            await self._touch_session(session_id, new_title)
+        
+        await self.db.commit()
+        await self._refresh_if_expired(message)
         
         logger.info(
             "message.added",
@@ -253,11 +412,128 @@ class SessionManager:
         
         return message
     
+    async def add_messages(
+        self,
+        session_id: int,
+        messages: List[Dict[str, Any]]
+    ) -> List[ConversationMessage]:
+        """
+        Add several messages to a session in one transaction.
+        
+        Each entry takes the same fields as add_message (role, content,
+        message_type, sql_query, results, ...), except context_updates and
+        discovery_results. The session is touched once and committed once.
+        
+        Args:
+            session_id: Session ID
+            messages: Message fields, in conversation order
+            
+        Returns:
+            Created messages
+        """
+        if not messages:
+            return []
+        
+        created = [_new_message(session_id=session_id, **fields) for fields in messages]
+        self.db.add_all(created)
+        
+        # First user message in the batch provides the auto title
+        new_title = next(
+            filter(None, (_title_for(m.role, m.content) for m in created)),
+            None
+        )
+        await self._touch_session(session_id, new_title)
+        
+        await self.db.flush()
+        ids = [message.id for message in created]
+        await self.db.commit()
+        await self._reload_if_expired(ConversationMessage, created, ids)
+        
+        logger.info(
+            "messages.added",
+            session_id=session_id,
+            count=len(created)
+        )
+        
+        return created
+    
+    async def _touch_session(self, session_id: int, new_title: Optional[str]) -> None:
+        """Update session last activity (and empty title) without loading it"""
+        values = {"last_activity_at": datetime.utcnow()}
+        if new_title:
+            values["title"] = case(
+                (or_(ConversationSession.title.is_(None), ConversationSession.title == ""), new_title),
+                else_=ConversationSession.title
+            )
+        await self.db.execute(
+            update(ConversationSession)
+            .where(ConversationSession.id == session_id)
+            .values(**values)
+        )
+    
+    async def _update_session(
+        self,
+        session_id: int,
+        **values: Any
+    ) -> Optional[ConversationSession]:
+        """Set session columns with one UPDATE ... RETURNING (uncommitted)"""
+        result = await self.db.execute(
+            update(ConversationSession)
+            .where(ConversationSession.id == session_id)
+            .values(**values)
+            .returning(ConversationSession)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def _refresh_if_expired(self, obj: Any) -> None:
+        """
+        Reload an object that commit() expired.
+        
+        No query when the session factory sets expire_on_commit=False.
+        Otherwise the object is refreshed here, because reading an expired
+        attribute would lazy-load outside the async context (MissingGreenlet).
+        """
+        if sa_inspect(obj).expired_attributes:
+            await self.db.refresh(obj)
+    
+    async def _reload_if_expired(self, model: Any, objects: List[Any], ids: List[int]) -> None:
+        """Batch form of _refresh_if_expired: one SELECT for all objects"""
+        if objects and sa_inspect(objects[0]).expired_attributes:
+            await self.db.execute(
+                select(model)
+                .where(model.id.in_(ids))
+                .execution_options(populate_existing=True)
+            )
+    
+    async def get_discovery_results(self, message_id: int) -> List[Dict[str, Any]]:
+        """
+        Get data sources suggested by a discovery message.
+        
+        Args:
+            message_id: Message ID
+            
+        Returns:
+            List of {id, name, display_name, score}, best match first
+        """
+        result = await self.db.execute(
+            select(
+                DatabaseConnection.id,
+                DatabaseConnection.name,
+                DatabaseConnection.display_name,
+                _discovery_results.c.score
+            )
+            .join(_discovery_results, _discovery_results.c.data_source_id == DatabaseConnection.id)
+            .where(_discovery_results.c.message_id == message_id)
+            .order_by(_discovery_results.c.rank)
+        )
+        return [row._asdict() for row in result]
+    
     async def update_session_context(
         self,
         session_id: int,
         context_updates: Dict[str, Any]
-    ) -> bool:
+    ) -> Optional[ConversationSession]:
         """
         Update session context.
         
@@ -266,17 +542,17 @@ class SessionManager:
             context_updates: Context updates
             
         Returns:
-            Success status
+            Updated session, or None if it does not exist
         """
         session = await self.get_session(session_id, load_messages=False)
         if not session:
-            return False
+            return None
         
         session.update_context(context_updates)
         session.last_activity_at = datetime.utcnow()
         
         await self.db.commit()
-        await self._invalidate_session_cache(session_id)
+        await self._refresh_if_expired(session)
         
         logger.info(
             "session.context_updated",
@@ -284,13 +560,13 @@ class SessionManager:
             updates=list(context_updates.keys())
         )
         
-        return True
+        return session
     
     async def set_data_source(
         self,
         session_id: int,
         data_source_id: int
-    ) -> bool:
+    ) -> Optional[ConversationSession]:
         """
         Set data source for session.
         
@@ -299,17 +575,18 @@ class SessionManager:
             data_source_id: Data source ID
             
         Returns:
-            Success status
+            Updated session, or None if it does not exist
         """
-        session = await self.get_session(session_id, load_messages=False)
+        session = await self._update_session(
+            session_id,
+            data_source_id=data_source_id,
+            last_activity_at=datetime.utcnow()
+        )
         if not session:
-            return False
-        
-        session.data_source_id = data_source_id
-        session.last_activity_at = datetime.utcnow()
+            return None
         
         await self.db.commit()
-        await self._invalidate_session_cache(session_id)
+        await self._refresh_if_expired(session)
         
         logger.info(
             "session.data_source_set",
@@ -317,13 +594,13 @@ class SessionManager:
             data_source_id=data_source_id
         )
         
-        return True
+        return session
     
     async def end_session(
         self,
         session_id: int,
         status: SessionStatus = SessionStatus.COMPLETED
-    ) -> bool:
+    ) -> Optional[ConversationSession]:
         """
         End a session.
         
@@ -332,17 +609,18 @@ class SessionManager:
             status: Final status
             
         Returns:
-            Success status
+            Ended session, or None if it does not exist
         """
-        session = await self.get_session(session_id, load_messages=False)
+        session = await self._update_session(
+            session_id,
+            status=status,
+            ended_at=datetime.utcnow()
+        )
         if not session:
-            return False
-        
-        session.status = status
-        session.ended_at = datetime.utcnow()
+            return None
         
         await self.db.commit()
-        await self._invalidate_session_cache(session_id)
+        await self._refresh_if_expired(session)
         
         logger.info(
             "session.ended",
@@ -351,12 +629,13 @@ class SessionManager:
             duration_seconds=session.duration_seconds
         )
         
-        return True
+        return session
     
     async def get_session_history(
         self,
         session_id: int,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        offset: int = 0
     ) -> List[ConversationMessage]:
         """
         Get session message history.
@@ -364,22 +643,42 @@ class SessionManager:
         Args:
             session_id: Session ID
             limit: Optional limit on messages
+            offset: Number of oldest messages to skip
             
         Returns:
             List of messages
         """
+        # id breaks ties between messages added in the same batch
         query = select(ConversationMessage).where(
             ConversationMessage.session_id == session_id
-        ).order_by(ConversationMessage.created_at.asc())
+        ).order_by(ConversationMessage.created_at.asc(), ConversationMessage.id.asc())
         
         if limit:
             query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
         
         result = await self.db.execute(query)
         messages = result.scalars().all()
         
         return list(messages)
     
+    async def count_messages(self, session_id: int) -> int:
+        """
+        Count messages in a session without loading them.
+        
+        Args:
+            session_id: Session ID
+            
+        Returns:
+            Number of messages
+        """
+        result = await self.db.execute(
+            select(func.count(ConversationMessage.id))
+            .where(ConversationMessage.session_id == session_id)
+        )
+        return result.scalar_one()
+    
     async def get_context_from_history(
         self,
         session_id: int,
@@ -388,6 +687,9 @@ class SessionManager:
         """
         Extract context from recent message history.
         
+        Results are memoized per process until the session gets a new
+        message; callers must not mutate the returned dict.
+        
         Args:
             session_id: Session ID
             last_n_messages: Number of recent messages to analyze
@@ -395,7 +697,34 @@ class SessionManager:
         Returns:
             Context dict with tables, columns, filters, etc.
         """
-        messages = await self.get_session_history(session_id, limit=last_n_messages)
+        newest = await self.db.execute(
+            select(ConversationMessage.id, ConversationMessage.created_at)
+            .where(ConversationMessage.session_id == session_id)
+            .order_by(ConversationMessage.id.desc())
+            .limit(1)
+        )
+        newest_row = newest.first()
+        cache_key = (session_id, tuple(newest_row) if newest_row else None, last_n_messages)
+        
+        cached = _history_context_cache.get(cache_key)
+        if cached is not None:
+            _history_context_cache.move_to_end(cache_key)
+            return cached
+        
+        # Newest N messages, only the columns used here (stored result
+        # rows are never loaded), then back to conversation order
+        recent = await self.db.execute(
+            select(
+                ConversationMessage.role,
+                ConversationMessage.content,
+                ConversationMessage.message_type,
+                ConversationMessage.sql_query
+            )
+            .where(ConversationMessage.session_id == session_id)
+            .order_by(ConversationMessage.created_at.desc(), ConversationMessage.id.desc())
+            .limit(last_n_messages)
+        )
+        messages = reversed(recent.all())
         
         context = {
             "tables_used": set(),
@@ -409,15 +738,7 @@ class SessionManager:
             # Extract from SQL queries
             if msg.sql_query:
                 context["last_sql_query"] = msg.sql_query
-                # Simple extraction (could be enhanced with SQL parsing)
-                sql_lower = msg.sql_query.lower()
-                if "from" in sql_lower:
-                    # Extract table names (basic approach)
-                    parts = sql_lower.split("from")[1].split("where")[0].split("join")
-                    for part in parts:
-                        table = part.strip().split()[0].strip()
-                        if table:
-                            context["tables_used"].add(table)
+                context["tables_used"].update(_extract_tables(msg.sql_query))
             
             # Add to conversation summary
             context["conversation_summary"].append({
@@ -430,6 +751,10 @@ class SessionManager:
         context["tables_used"] = list(context["tables_used"])
         context["columns_referenced"] = list(context["columns_referenced"])
         
+        _history_context_cache[cache_key] = context
+        if len(_history_context_cache) > _HISTORY_CONTEXT_CACHE_SIZE:
+            _history_context_cache.popitem(last=False)
+        
         return context
     
     async def cleanup_expired_sessions(self, batch_size: int = 100) -> int:
@@ -442,39 +767,31 @@ class SessionManager:
         Returns:
             Number of sessions cleaned
         """
-        query = select(ConversationSession).where(
+        now = datetime.utcnow()
+        
+        # Single UPDATE; the id subquery keeps each run bounded to batch_size
+        expired_ids = select(ConversationSession.id).where(
             and_(
-                ConversationSession.expires_at <= datetime.utcnow(),
+                ConversationSession.expires_at <= now,
                 ConversationSession.status == SessionStatus.ACTIVE
             )
         ).limit(batch_size)
         
-        result = await self.db.execute(query)
-        expired_sessions = result.scalars().all()
+        stmt = (
+            update(ConversationSession)
+            .where(ConversationSession.id.in_(expired_ids.scalar_subquery()))
+            .values(status=SessionStatus.EXPIRED, ended_at=now)
+            .execution_options(synchronize_session=False)
+        )
         
-        count = 0
-        for session in expired_sessions:
-            session.status = SessionStatus.EXPIRED
-            session.ended_at = datetime.utcnow()
-            count += 1
+        result = await self.db.execute(stmt)
+        count = result.rowcount
         
         if count > 0:
             await self.db.commit()
             logger.info("sessions.cleaned_up", count=count)
         
         return count
-    
-    # Cache helpers
-    
-    async def _cache_session(self, session: ConversationSession) -> None:
-        """Cache session in Redis"""
-        cache_key = f"session:v1:{session.id}"
-        await cache.set(cache_key, session, ttl=self.cache_ttl)
-    
-    async def _invalidate_session_cache(self, session_id: int) -> None:
-        """Invalidate session cache"""
-        cache_key = f"session:v1:{session_id}"
-        await cache.delete(cache_key)
 
 
 def get_session_manager(db: AsyncSession) -> SessionManager:
@@ -3,13 +3,19 @@ Pytest configuration and fixtures.
 """
 
 import asyncio
+import os
 from typing import AsyncGenerator, Generator
 
 import pytest
 from fastapi.testclient import TestClient
-from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Minimum bcrypt work factor for tests; must be set before settings load
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
 
 from app.core.config import settings
 from app.main import app
@@ -28,22 +34,31 @@ def event_loop() -> Generator:
     loop.close()
 
 
-@pytest.fixture
-async def test_db() -> AsyncGenerator[AsyncSession, None]:
-    """Create test database session."""
-    engine = create_async_engine(TEST_DATABASE_URL, echo=False)
+@pytest.fixture(scope="session")
+async def engine() -> AsyncGenerator[AsyncEngine, None]:
+    """Create the test engine and schema once per test session."""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        echo=False,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    
+    # pysqlite's implicit transaction handling breaks SAVEPOINT; let
+    # SQLAlchemy emit BEGIN itself
+    @event.listens_for(engine.sync_engine, "connect")
+    def _disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine.sync_engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
     
     # Create tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
-    # Create session
-    async_session = sessionmaker(
-        engine, class_=AsyncSession, expire_on_commit=False
-    )
-    
-    async with async_session() as session:
-        yield session
+    yield engine
     
     # Cleanup
     async with engine.begin() as conn:
@@ -52,10 +67,45 @@ async def test_db() -> AsyncGenerator[AsyncSession, None]:
     await engine.dispose()
 
 
+@pytest.fixture(scope="module")
+async def db_connection(engine: AsyncEngine) -> AsyncGenerator[AsyncConnection, None]:
+    """Connection holding one transaction per test module, rolled back at the end."""
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        
+        yield conn
+        
+        await transaction.rollback()
+
+
+def _session_factory(conn: AsyncConnection) -> sessionmaker:
+    """Sessions on conn whose commits only release a SAVEPOINT."""
+    return sessionmaker(
+        bind=conn,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+
+
 @pytest.fixture
-def client() -> TestClient:
-    """Create test client."""
-    return TestClient(app)
+async def test_db(db_connection: AsyncConnection) -> AsyncGenerator[AsyncSession, None]:
+    """Create test database session rolled back after each test."""
+    # Module fixtures (test_user) sit below this SAVEPOINT and survive it;
+    # everything the test writes is discarded
+    savepoint = await db_connection.begin_nested()
+    
+    async with _session_factory(db_connection)() as session:
+        yield session
+    
+    await savepoint.rollback()
+
+
+@pytest.fixture(scope="session")
+def client() -> Generator[TestClient, None, None]:
+    """Create test client shared by the whole test session (one app lifespan)."""
+    with TestClient(app) as c:
+        yield c
 
 
 @pytest.fixture
@@ -67,15 +117,16 @@ async def async_client(test_db: AsyncSession) -> AsyncGenerator[AsyncClient, Non
     
     app.dependency_overrides[get_db] = override_get_db
     
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+    # In-process ASGI dispatch; no socket is bound
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
     
     app.dependency_overrides.clear()
 
 
-@pytest.fixture
-async def test_user(test_db: AsyncSession):
-    """Create a test user."""
+@pytest.fixture(scope="module")
+async def test_user(db_connection: AsyncConnection):
+    """Create a test user shared by the tests of a module."""
     from app.models import User
     
     user = User(
@@ -87,13 +138,20 @@ async def test_user(test_db: AsyncSession):
         is_superuser=False,
     )
     
-    test_db.add(user)
-    await test_db.commit()
-    await test_db.refresh(user)
+    async with _session_factory(db_connection)() as session:
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
     
     return user
 
 
+@pytest.fixture(scope="session")
+def sample_bcrypt_hash() -> str:
+    """Hash of "testpassword123", computed once per test session."""
+    return AuthService.hash_password("testpassword123")
+
+
 @pytest.fixture
 def auth_token(test_user) -> str:
     """Create authentication token for test user."""
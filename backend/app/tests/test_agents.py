@@ -30,6 +30,11 @@ def test_sql_validation():
     invalid_sql = "UPDATE users SET name = 'test'"
     result = agent._validate_sql(invalid_sql)
     assert result["valid"] is False
+    
+    # Valid - keyword only appears inside an identifier
+    valid_sql = "SELECT last_updated, created_at FROM users"
+    result = agent._validate_sql(valid_sql)
+    assert result["valid"] is True
 
 
 def test_sql_extraction():
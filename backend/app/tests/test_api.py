@@ -26,12 +26,14 @@ def test_detailed_health_check(client: TestClient):
     assert "version" in data
 
 
+@pytest.mark.slow
 def test_api_docs_available(client: TestClient):
     """Test that API documentation is accessible."""
     response = client.get("/docs")
     assert response.status_code == 200
 
 
+@pytest.mark.slow
 def test_metrics_endpoint(client: TestClient):
     """Test Prometheus metrics endpoint."""
     response = client.get("/metrics")
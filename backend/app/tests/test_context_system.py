@@ -7,9 +7,14 @@ Tests cover:
 - ContextOptimizer
 - ContextManager
 """
+import hashlib
+import os
+
+import numpy as np
 import pytest
 import asyncio
 from unittest.mock import Mock, AsyncMock, MagicMock, patch
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
 from app.services.embedding import EmbeddingService
@@ -19,69 +24,64 @@ from app.services.context_manager import ContextManager
 from app.models.semantic_layer import Metric, BusinessGlossary, BusinessRule
 
 
+@pytest.mark.xdist_group("embedding")
 class TestEmbeddingService:
     """Test embedding generation and similarity search"""
     
-    def test_generate_embedding(self):
+    def test_generate_embedding(self, embedding_service):
         """Test basic embedding generation"""
-        service = EmbeddingService()
-        
         text = "What is our total revenue?"
-        embedding = service.generate_embedding(text)
+        embedding = embedding_service.generate_embedding(text, return_numpy=True)
         
-        assert isinstance(embedding, list)
-        assert len(embedding) == 384  # all-MiniLM-L6-v2 dimension
-        assert all(isinstance(x, float) for x in embedding)
+        assert embedding.shape == (384,)  # all-MiniLM-L6-v2 dimension
+        assert embedding.dtype == np.float32
     
-    def test_generate_embedding_empty_text(self):
+    def test_generate_embedding_empty_text(self, embedding_service):
         """Test embedding with empty text"""
-        service = EmbeddingService()
-        
-        embedding = service.generate_embedding("")
+        embedding = embedding_service.generate_embedding("")
         
         assert isinstance(embedding, list)
-        assert len(embedding) == 384
-        assert all(x == 0.0 for x in embedding)
+        vector = np.asarray(embedding, dtype=np.float32)
+        assert vector.shape == (384,)
+        assert not vector.any()
     
-    def test_generate_embeddings_batch(self):
+    def test_generate_embeddings_batch(self, embedding_service):
         """Test batch embedding generation"""
-        service = EmbeddingService()
-        
         texts = [
             "What is our revenue?",
             "Show me customer churn",
             "Top products by sales"
         ]
-        embeddings = service.generate_embeddings_batch(texts)
+        embeddings = embedding_service.generate_embeddings_batch(texts, return_numpy=True)
         
-        assert len(embeddings) == 3
-        assert all(len(e) == 384 for e in embeddings)
+        assert embeddings.shape == (3, 384)
+        assert embeddings.dtype == np.float32
     
     @pytest.mark.asyncio
-    async def test_store_and_search_embedding(self, db_session):
+    async def test_store_and_search_embedding(self, db_session, embedding_service):
         """Test storing and searching embeddings"""
-        service = EmbeddingService()
-        
-        # Store test embeddings
-        await service.store_embedding(
+        # Store test embeddings (one batched encode + insert)
+        await embedding_service.store_embeddings_batch(
             db=db_session,
-            namespace="test_metrics",
-            object_id="revenue_001",
-            content="Total revenue from all sources",
-            metadata={"metric_name": "revenue"}
-        )
-        
-        await service.store_embedding(
-            db=db_session,
-            namespace="test_metrics",
-            object_id="profit_001",
-            content="Net profit after expenses",
-            metadata={"metric_name": "profit"}
+            items=[
+                {
+                    "namespace": "test_metrics",
+                    "object_id": "revenue_001",
+                    "content": "Total revenue from all sources",
+                    "metadata": {"metric_name": "revenue"}
+                },
+                {
+                    "namespace": "test_metrics",
+                    "object_id": "profit_001",
+                    "content": "Net profit after expenses",
+                    "metadata": {"metric_name": "profit"}
+                }
+            ]
         )
         
         # Search for similar
         query = "What is our total revenue?"
-        results = await service.similarity_search(
+        results = await embedding_service.similarity_search(
             db=db_session,
             query=query,
             namespace="test_metrics",
@@ -94,12 +94,10 @@ class TestEmbeddingService:
         assert 0 <= results[0]["similarity"] <= 1
     
     @pytest.mark.asyncio
-    async def test_delete_embeddings(self, db_session):
+    async def test_delete_embeddings(self, db_session, embedding_service):
         """Test deleting embeddings"""
-        service = EmbeddingService()
-        
         # Store test embedding
-        await service.store_embedding(
+        await embedding_service.store_embedding(
             db=db_session,
             namespace="test_delete",
             object_id="test_001",
@@ -107,7 +105,7 @@ class TestEmbeddingService:
         )
         
         # Delete
-        deleted = await service.delete_embeddings(
+        deleted = await embedding_service.delete_embeddings(
             db=db_session,
             namespace="test_delete",
             object_ids=["test_001"]
@@ -230,72 +228,44 @@ class TestContextOptimizer:
         assert costs["gpt-4-turbo"]["total_tokens"] == 2600
 
 
+@pytest.mark.xdist_group("embedding")
 class TestContextRetriever:
     """Test context retrieval"""
     
     @pytest.mark.asyncio
-    async def test_retrieve_relevant_metrics(self, db_session):
-        """Test metric retrieval"""
-        # Create test metrics
-        metric = Metric(
-            name="revenue",
-            display_name="Total Revenue",
-            description="Sum of all sales",
-            sql_definition="SUM(orders.total)",
-            certified=True,
-            owner="CFO"
-        )
-        db_session.add(metric)
-        db_session.commit()
-        
-        # Create embeddings
-        embedding_service = EmbeddingService()
-        await embedding_service.store_embedding(
-            db=db_session,
-            namespace="metrics",
-            object_id=str(metric.id),
-            content=f"{metric.display_name} {metric.description}"
-        )
-        
-        # Retrieve
-        retriever = ContextRetriever(db=db_session)
-        results = await retriever.retrieve_relevant_metrics(
-            query="What is our total revenue?",
-            top_k=1
-        )
-        
-        assert len(results) > 0
-        assert results[0]["name"] == "revenue"
-        assert "similarity" in results[0]
-    
-    @pytest.mark.asyncio
-    async def test_retrieve_business_rules(self, db_session):
-        """Test business rule retrieval"""
-        # Create test rule
-        rule = BusinessRule(
-            rule_type="fiscal_calendar",
-            name="Fiscal Year",
-            definition={"start": "November 1"},
-            active=True
-        )
-        db_session.add(rule)
-        db_session.commit()
-        
-        # Retrieve
-        retriever = ContextRetriever(db=db_session)
-        results = await retriever.retrieve_business_rules(
-            rule_types=["fiscal_calendar"]
-        )
+    @pytest.mark.parametrize(
+        "method,kwargs,field,expected,extra_keys",
+        [
+            (
+                "retrieve_relevant_metrics",
+                {"query": "What is our total revenue?", "top_k": 1},
+                "name",
+                "revenue",
+                ("similarity",)
+            ),
+            (
+                "retrieve_business_rules",
+                {"rule_types": ["fiscal_calendar"]},
+                "rule_type",
+                "fiscal_calendar",
+                ()
+            ),
+        ]
+    )
+    async def test_retrieve_seeded_context(
+        self, seeded_retriever, method, kwargs, field, expected, extra_keys
+    ):
+        """Test metric and business rule retrieval against seeded data"""
+        results = await getattr(seeded_retriever, method)(**kwargs)
         
         assert len(results) > 0
-        assert results[0]["rule_type"] == "fiscal_calendar"
+        assert results[0][field] == expected
+        assert all(key in results[0] for key in extra_keys)
     
     @pytest.mark.asyncio
-    async def test_retrieve_all_context(self, db_session):
+    async def test_retrieve_all_context(self, seeded_retriever):
         """Test retrieving all context types"""
-        retriever = ContextRetriever(db=db_session)
-        
-        context = await retriever.retrieve_all_context(
+        context = await seeded_retriever.retrieve_all_context(
             query="Show me revenue",
             database_id=1,
             tables=["orders"],
@@ -314,9 +284,9 @@ class TestContextManager:
     """Test context orchestration"""
     
     @pytest.mark.asyncio
-    async def test_get_context_for_query(self, db_session):
+    async def test_get_context_for_query(self, mock_db, fake_retriever):
         """Test end-to-end context retrieval"""
-        manager = ContextManager(db=db_session)
+        manager = ContextManager(db=mock_db, retriever=fake_retriever)
         
         result = await manager.get_context_for_query(
             query="What is our total revenue?",
@@ -338,14 +308,9 @@ class TestContextManager:
         assert result["stats"]["cache_hit"] == False
     
     @pytest.mark.asyncio
-    async def test_context_caching(self, db_session):
+    async def test_context_caching(self, mock_db, fake_retriever, mock_cache):
         """Test context caching"""
-        # Mock cache service
-        mock_cache = AsyncMock()
-        mock_cache.get = AsyncMock(return_value=None)
-        mock_cache.set = AsyncMock()
-        
-        manager = ContextManager(db=db_session, cache=mock_cache)
+        manager = ContextManager(db=mock_db, retriever=fake_retriever, cache=mock_cache)
         
         # First call - should save to cache
         result1 = await manager.get_context_for_query(
@@ -360,41 +325,35 @@ class TestContextManager:
         assert mock_cache.set.called
     
     @pytest.mark.asyncio
-    async def test_cache_key_generation(self, db_session):
+    async def test_cache_key_generation(self, mock_db, fake_retriever):
         """Test cache key generation"""
-        manager = ContextManager(db=db_session)
+        manager = ContextManager(db=mock_db, retriever=fake_retriever)
         
-        key1 = manager._generate_cache_key(
-            query="What is revenue?",
-            database_id=1,
-            tables=["orders"],
-            max_tokens=8000
-        )
-        
-        key2 = manager._generate_cache_key(
-            query="what is revenue?",  # Different case
-            database_id=1,
-            tables=["orders"],
-            max_tokens=8000
-        )
+        base = {
+            "query": "What is revenue?",
+            "database_id": 1,
+            "tables": ["orders"],
+            "max_tokens": 8000
+        }
+        keys = {
+            label: manager._generate_cache_key(**{**base, **overrides})
+            for label, overrides in [
+                ("base", {}),
+                ("lowercase", {"query": "what is revenue?"}),  # Different case
+                ("other_db", {"database_id": 2}),  # Different database
+            ]
+        }
         
         # Should be same (case insensitive)
-        assert key1 == key2
-        
-        key3 = manager._generate_cache_key(
-            query="What is revenue?",
-            database_id=2,  # Different database
-            tables=["orders"],
-            max_tokens=8000
-        )
+        assert keys["base"] == keys["lowercase"]
         
         # Should be different
-        assert key1 != key3
+        assert keys["base"] != keys["other_db"]
     
     @pytest.mark.asyncio
-    async def test_flatten_context(self, db_session):
+    async def test_flatten_context(self, mock_db, fake_retriever):
         """Test context flattening"""
-        manager = ContextManager(db=db_session)
+        manager = ContextManager(db=mock_db, retriever=fake_retriever)
         
         context_dict = {
             "metrics": [
@@ -417,15 +376,16 @@ class TestContextManager:
         items = manager._flatten_context(context_dict)
         
         assert len(items) == 3  # metric, glossary, permissions
-        assert all("type" in item for item in items)
-        assert all("relevance" in item for item in items)
+        missing = [item for item in items if "type" not in item or "relevance" not in item]
+        assert not missing
 
 
 class TestIntegration:
     """Integration tests for the full context system"""
     
     @pytest.mark.asyncio
-    async def test_full_context_pipeline(self, db_session):
+    @pytest.mark.xdist_group("embedding")
+    async def test_full_context_pipeline(self, db_session, embedding_service):
         """Test complete context retrieval pipeline"""
         # 1. Create test data
         metric = Metric(
@@ -439,7 +399,6 @@ class TestIntegration:
         db_session.commit()
         
         # 2. Create embeddings
-        embedding_service = EmbeddingService()
         await embedding_service.store_embedding(
             db=db_session,
             namespace="metrics",
@@ -447,8 +406,11 @@ class TestIntegration:
             content=f"{metric.display_name} {metric.description}"
         )
         
-        # 3. Use context manager
-        manager = ContextManager(db=db_session)
+        # 3. Use context manager (on the shared model)
+        manager = ContextManager(
+            db=db_session,
+            retriever=ContextRetriever(db=db_session, embedding_service=embedding_service)
+        )
         
         result = await manager.get_context_for_query(
             query="What is our ARR?",
@@ -465,9 +427,9 @@ class TestIntegration:
         assert result["metadata"]["items_included"] > 0
     
     @pytest.mark.asyncio
-    async def test_token_budget_enforcement(self, db_session):
+    async def test_token_budget_enforcement(self, mock_db, fake_retriever):
         """Test that token budget is respected"""
-        manager = ContextManager(db=db_session)
+        manager = ContextManager(db=mock_db, retriever=fake_retriever)
         
         # Very small budget
         result = await manager.get_context_for_query(
@@ -489,29 +451,143 @@ class TestIntegration:
 
 # Pytest fixtures
 
+class FakeEmbeddingModel:
+    """Stand-in for SentenceTransformer with deterministic hash-seeded vectors"""
+    
+    dimension = 384
+    
+    def _vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+    
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._vector(sentences)
+        return np.stack([self._vector(s) for s in sentences])
+
+
+@pytest.fixture(scope="session")
+def embedding_service():
+    """Shared embedding service, so the model loads once per test run"""
+    service = EmbeddingService()
+    service.generate_embedding("warmup")
+    return service
+
+
+@pytest.fixture(scope="session")
+def fake_embedding_service():
+    """Embedding service that never loads the transformer model"""
+    return EmbeddingService(model=FakeEmbeddingModel())
+
+
 @pytest.fixture
-def db_session():
-    """Create a test database session"""
-    # This would use your test database
-    # For now, return a mock
-    session = MagicMock(spec=Session)
-    session.execute = MagicMock()
-    session.commit = MagicMock()
-    session.add = MagicMock()
-    return session
+def mock_db():
+    """Stand-in session for unit tests; retriever queries on it fail and yield no context"""
+    return Mock()
 
 
-if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
+@pytest.fixture
+def fake_retriever(mock_db, fake_embedding_service):
+    """Retriever for tests whose assertions don't depend on embedding quality or data"""
+    return ContextRetriever(db=mock_db, embedding_service=fake_embedding_service)
 
 
+@pytest.fixture
+def mock_cache():
+    """Cache service mock that always misses"""
+    cache = AsyncMock()
+    cache.get = AsyncMock(return_value=None)
+    cache.set = AsyncMock()
+    return cache
 
 
+@pytest.fixture(scope="module")
+def pg_engine():
+    """Sync engine on the dedicated PostgreSQL test database (TEST_DATABASE_URL).
+    
+    The semantic layer tables use JSONB, ARRAY and pgvector columns, so the
+    schema comes from the alembic migrations rather than SQLite. Never the
+    application database: tests write to it, even if they roll back.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    
+    engine = create_engine(url.replace('+asyncpg', ''))
+    
+    yield engine
+    
+    engine.dispose()
 
 
+@pytest.fixture(scope="module")
+def pg_connection(pg_engine):
+    """Connection holding one transaction per test module, rolled back at the end"""
+    conn = pg_engine.connect()
+    transaction = conn.begin()
+    
+    yield conn
+    
+    transaction.rollback()
+    conn.close()
 
 
+def _pg_session(conn) -> Session:
+    """Session on conn whose commits only release a SAVEPOINT"""
+    return Session(bind=conn, join_transaction_mode="create_savepoint")
 
 
+@pytest.fixture
+def db_session(pg_connection):
+    """Create a test database session rolled back after each test"""
+    # Module fixtures (seeded_context) sit below this SAVEPOINT and survive it
+    savepoint = pg_connection.begin_nested()
+    session = _pg_session(pg_connection)
+    
+    yield session
+    
+    session.close()
+    savepoint.rollback()
 
 
+@pytest.fixture(scope="module")
+async def seeded_context(pg_connection, embedding_service):
+    """One metric (with embedding) and business rule, seeded once per module"""
+    session = _pg_session(pg_connection)
+    
+    metric = Metric(
+        name="revenue",
+        display_name="Total Revenue",
+        description="Sum of all sales",
+        sql_definition="SUM(orders.total)",
+        certified=True,
+        owner="CFO"
+    )
+    rule = BusinessRule(
+        rule_type="fiscal_calendar",
+        name="Fiscal Year",
+        definition={"start": "November 1"},
+        active=True
+    )
+    session.add_all([metric, rule])
+    session.commit()
+    
+    await embedding_service.store_embedding(
+        db=session,
+        namespace="metrics",
+        object_id=str(metric.id),
+        content=f"{metric.display_name} {metric.description}"
+    )
+    
+    session.close()
+
+
+@pytest.fixture
+def seeded_retriever(seeded_context, db_session, embedding_service):
+    """Retriever over the module's seeded context"""
+    return ContextRetriever(db=db_session, embedding_service=embedding_service)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -4,8 +4,8 @@ Tests for Phase 4: Conversational Analytics System
 Tests session management, query orchestration, and multi-turn conversations.
 """
 import pytest
-from datetime import datetime, timedelta
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
 
 from app.models.session import (
     ConversationSession,
@@ -41,6 +41,18 @@ class TestSessionManager:
         assert session.is_active is True
         assert session.is_expired is False
     
+    async def test_create_sessions(self, db: AsyncSession, test_user: User):
+        """Test creating several sessions in one batch"""
+        manager = SessionManager(db)
+        
+        sessions = await manager.create_sessions(user_id=test_user.id, count=3)
+        
+        assert len({session.id for session in sessions}) == 3
+        assert all(session.status == SessionStatus.ACTIVE for session in sessions)
+        
+        user_sessions = await manager.get_user_sessions(test_user.id)
+        assert {session.id for session in sessions} <= {session.id for session in user_sessions}
+    
     async def test_add_message(self, db: AsyncSession, test_user: User):
         """Test adding messages to session"""
         manager = SessionManager(db)
@@ -96,6 +108,67 @@ class TestSessionManager:
         session = await manager.get_session(session.id, load_messages=False)
         assert session.title == "Show me total revenue for this year"
     
+    async def test_get_session_reuses_loaded_session(self, db: AsyncSession, test_user: User):
+        """Test repeated lookups within one manager skip the database"""
+        manager = SessionManager(db)
+        
+        session = await manager.create_session(user_id=test_user.id)
+        
+        assert await manager.get_session(session.id, user_id=test_user.id) is session
+        assert await manager.get_session(session.id, user_id=test_user.id + 1) is None
+    
+    async def test_results_readable_with_expire_on_commit(
+        self, expiring_db: AsyncSession, test_user: User
+    ):
+        """Test returned objects are loaded even when commit expires them"""
+        manager = SessionManager(expiring_db)
+        
+        session = await manager.create_session(user_id=test_user.id, title="Expiring")
+        assert session.title == "Expiring"
+        session_id = session.id  # Expired again by the next commit
+        
+        message = await manager.add_message(
+            session_id, MessageRole.USER, "Hello", context_updates={"last_filter": "x"}
+        )
+        assert message.content == "Hello"
+        
+        added = await manager.add_messages(
+            session_id, [{"role": MessageRole.ASSISTANT, "content": "Hi"}]
+        )
+        assert added[0].content == "Hi"
+        
+        sessions = await manager.create_sessions(user_id=test_user.id, count=2)
+        assert all(s.status == SessionStatus.ACTIVE for s in sessions)
+        
+        # Expired memo entries are re-queried rather than returned stale
+        session = await manager.get_session(session_id, user_id=test_user.id)
+        assert session.context["last_filter"] == "x"
+        
+        session = await manager.end_session(session_id)
+        assert session.status == SessionStatus.COMPLETED
+    
+    async def test_context_update_after_user_message(self, db: AsyncSession, test_user: User):
+        """Test a USER turn then an ASSISTANT turn with context updates (orchestrator flow)"""
+        manager = SessionManager(db)
+        
+        session = await manager.create_session(user_id=test_user.id)
+        
+        # Touches the session with a CASE update, expiring its loaded title
+        await manager.add_message(session.id, MessageRole.USER, "Show me revenue")
+        
+        # Reuses the session through get_session and reads session.title
+        await manager.add_message(
+            session.id,
+            MessageRole.ASSISTANT,
+            "Here is revenue",
+            message_type=MessageType.QUERY_RESULT,
+            context_updates={"last_query": "SELECT 1"}
+        )
+        
+        session = await manager.get_session(session.id)
+        assert session.title == "Show me revenue"
+        assert session.context["last_query"] == "SELECT 1"
+    
     async def test_update_context(self, db: AsyncSession, test_user: User):
         """Test session context updates"""
         manager = SessionManager(db)
@@ -103,15 +176,12 @@ class TestSessionManager:
         session = await manager.create_session(user_id=test_user.id)
         
         # Update context
-        success = await manager.update_session_context(
+        session = await manager.update_session_context(
             session.id,
             {"tables_used": ["sales", "customers"], "last_filter": "region='US'"}
         )
         
-        assert success is True
-        
-        # Reload and verify
-        session = await manager.get_session(session.id, load_messages=False)
+        assert session is not None
         assert session.context["tables_used"] == ["sales", "customers"]
         assert session.context["last_filter"] == "region='US'"
     
@@ -123,11 +193,8 @@ class TestSessionManager:
         assert session.data_source_id is None
         
         # Set data source
-        success = await manager.set_data_source(session.id, 123)
-        assert success is True
-        
-        # Reload and verify
-        session = await manager.get_session(session.id, load_messages=False)
+        session = await manager.set_data_source(session.id, 123)
+        assert session is not None
         assert session.data_source_id == 123
     
     async def test_end_session(self, db: AsyncSession, test_user: User):
@@ -138,11 +205,8 @@ class TestSessionManager:
         assert session.status == SessionStatus.ACTIVE
         
         # End session
-        success = await manager.end_session(session.id, SessionStatus.COMPLETED)
-        assert success is True
-        
-        # Reload and verify
-        session = await manager.get_session(session.id, load_messages=False)
+        session = await manager.end_session(session.id, SessionStatus.COMPLETED)
+        assert session is not None
         assert session.status == SessionStatus.COMPLETED
         assert session.ended_at is not None
     
@@ -152,16 +216,13 @@ class TestSessionManager:
         
         session = await manager.create_session(user_id=test_user.id)
         
-        # Add multiple messages
-        await manager.add_message(
-            session.id, MessageRole.USER, "Message 1", MessageType.USER_MESSAGE
-        )
-        await manager.add_message(
-            session.id, MessageRole.ASSISTANT, "Response 1", MessageType.INFO
-        )
-        await manager.add_message(
-            session.id, MessageRole.USER, "Message 2", MessageType.USER_MESSAGE
-        )
+        # Add multiple messages in one transaction
+        created = await manager.add_messages(session.id, [
+            {"role": MessageRole.USER, "content": "Message 1", "message_type": MessageType.USER_MESSAGE},
+            {"role": MessageRole.ASSISTANT, "content": "Response 1", "message_type": MessageType.INFO},
+            {"role": MessageRole.USER, "content": "Message 2", "message_type": MessageType.USER_MESSAGE},
+        ])
+        assert all(message.id is not None for message in created)
         
         # Get history
         history = await manager.get_session_history(session.id)
@@ -169,6 +230,11 @@ class TestSessionManager:
         assert history[0].content == "Message 1"
         assert history[1].content == "Response 1"
         assert history[2].content == "Message 2"
+        
+        # Count and page without loading everything
+        assert await manager.count_messages(session.id) == 3
+        page = await manager.get_session_history(session.id, limit=2, offset=1)
+        assert [message.content for message in page] == ["Response 1", "Message 2"]
     
     async def test_get_context_from_history(self, db: AsyncSession, test_user: User):
         """Test extracting context from conversation history"""
@@ -197,21 +263,54 @@ class TestSessionManager:
         """Test session expiration"""
         manager = SessionManager(db)
         
-        # Create session with short expiration
-        session = ConversationSession(
+        # Create session that expired an hour ago
+        session = await manager.create_session(
             user_id=test_user.id,
-            status=SessionStatus.ACTIVE,
-            expires_at=datetime.utcnow() - timedelta(hours=1)  # Expired
+            expires_in_hours=-1
         )
-        db.add(session)
-        await db.commit()
-        await db.refresh(session)
+        assert session.status == SessionStatus.ACTIVE
         
         # Get session (should mark as expired)
         session = await manager.get_session(session.id, load_messages=False)
         assert session.status == SessionStatus.EXPIRED
 
 
+class TestQueryCounts:
+    """Guard the message-ingest path against per-row (N+1) statements"""
+    
+    async def test_add_messages_statement_count_is_constant(
+        self, db: AsyncSession, engine: AsyncEngine, test_user: User
+    ):
+        """Test batch size does not change the number of SQL statements"""
+        manager = SessionManager(db)
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        async def count_for(n: int) -> int:
+            session = await manager.create_session(user_id=test_user.id)
+            statements.clear()
+            await manager.add_messages(session.id, [
+                {
+                    "role": MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT,
+                    "content": f"Message {i}",
+                    "message_type": MessageType.USER_MESSAGE if i % 2 == 0 else MessageType.INFO
+                }
+                for i in range(n)
+            ])
+            return len(statements)
+        
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            small = await count_for(2)
+            large = await count_for(10)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        
+        assert large == small
+
+
 class TestConversationMessage:
     """Test ConversationMessage model"""
     
@@ -280,53 +379,50 @@ class TestMultiTurnConversation:
         # Create session
         session = await manager.create_session(user_id=test_user.id)
         
-        # Step 1: User asks for data
-        await manager.add_message(
-            session.id,
-            MessageRole.USER,
-            "Show me sales data",
-            MessageType.USER_MESSAGE
-        )
-        
-        # Step 2: Assistant shows discovery results
-        await manager.add_message(
-            session.id,
-            MessageRole.ASSISTANT,
-            "Found 2 databases",
-            MessageType.DISCOVERY,
-            metadata={"discovery_results": [{"id": 1, "name": "sales_db"}]}
-        )
-        
-        # Step 3: User selects data source
-        await manager.set_data_source(session.id, 1)
-        await manager.add_message(
-            session.id,
-            MessageRole.USER,
-            "Selected Sales Database",
-            MessageType.USER_MESSAGE
-        )
-        
-        # Step 4: User asks query
-        await manager.add_message(
-            session.id,
-            MessageRole.USER,
-            "What's the total revenue?",
-            MessageType.USER_MESSAGE
-        )
-        
-        # Step 5: Assistant returns results
-        await manager.add_message(
-            session.id,
-            MessageRole.ASSISTANT,
-            "Total revenue is $1.5M",
-            MessageType.QUERY_RESULT,
-            sql_query="SELECT SUM(revenue) FROM sales",
-            results=[{"total_revenue": 1500000}]
-        )
+        # User selects the data source suggested by discovery
+        session = await manager.set_data_source(session.id, 1)
+        assert session.data_source_id == 1
+        
+        # Whole transcript in one batch; ids keep the insertion order
+        await manager.add_messages(session.id, [
+            # Step 1: User asks for data
+            {
+                "role": MessageRole.USER,
+                "content": "Show me sales data",
+                "message_type": MessageType.USER_MESSAGE
+            },
+            # Step 2: Assistant shows discovery results
+            {
+                "role": MessageRole.ASSISTANT,
+                "content": "Found 2 databases",
+                "message_type": MessageType.DISCOVERY,
+                "metadata": {"discovery_results": [{"id": 1, "name": "sales_db"}]}
+            },
+            # Step 3: User selects data source
+            {
+                "role": MessageRole.USER,
+                "content": "Selected Sales Database",
+                "message_type": MessageType.USER_MESSAGE
+            },
+            # Step 4: User asks query
+            {
+                "role": MessageRole.USER,
+                "content": "What's the total revenue?",
+                "message_type": MessageType.USER_MESSAGE
+            },
+            # Step 5: Assistant returns results
+            {
+                "role": MessageRole.ASSISTANT,
+                "content": "Total revenue is $1.5M",
+                "message_type": MessageType.QUERY_RESULT,
+                "sql_query": "SELECT SUM(revenue) FROM sales",
+                "results": [{"total_revenue": 1500000}]
+            },
+        ])
         
         # Verify conversation flow
-        history = await manager.get_session_history(session.id)
-        assert len(history) == 5
+        assert await manager.count_messages(session.id) == 5
+        history = await manager.get_session_history(session.id, limit=5)
         assert history[0].content == "Show me sales data"
         assert history[1].message_type == MessageType.DISCOVERY
         assert history[4].message_type == MessageType.QUERY_RESULT
@@ -339,19 +435,19 @@ class TestMultiTurnConversation:
         await manager.set_data_source(session.id, 1)
         
         # First query
-        await manager.add_message(
-            session.id,
-            MessageRole.USER,
-            "Show me sales by region",
-            MessageType.USER_MESSAGE
-        )
-        await manager.add_message(
-            session.id,
-            MessageRole.ASSISTANT,
-            "Sales by region",
-            MessageType.QUERY_RESULT,
-            sql_query="SELECT region, SUM(amount) FROM sales GROUP BY region"
-        )
+        await manager.add_messages(session.id, [
+            {
+                "role": MessageRole.USER,
+                "content": "Show me sales by region",
+                "message_type": MessageType.USER_MESSAGE
+            },
+            {
+                "role": MessageRole.ASSISTANT,
+                "content": "Sales by region",
+                "message_type": MessageType.QUERY_RESULT,
+                "sql_query": "SELECT region, SUM(amount) FROM sales GROUP BY region"
+            },
+        ])
         
         # Update context
         await manager.update_session_context(
@@ -398,16 +494,21 @@ class TestMultiTurnConversation:
 
 
 @pytest.fixture
-async def test_user(db: AsyncSession) -> User:
-    """Create test user"""
-    user = User(
-        email="test@example.com",
-        username="testuser",
-        hashed_password="hashed",
-        role="analyst"
-    )
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
-    return user
+def db(test_db: AsyncSession) -> AsyncSession:
+    """Per-test session (test_user comes from the module-scoped conftest fixture)"""
+    return test_db
+
 
+@pytest.fixture
+async def expiring_db(db_connection: AsyncConnection):
+    """Per-test session with SQLAlchemy's default expire_on_commit=True"""
+    savepoint = await db_connection.begin_nested()
+    
+    async with AsyncSession(
+        bind=db_connection,
+        expire_on_commit=True,
+        join_transaction_mode="create_savepoint"
+    ) as session:
+        yield session
+    
+    await savepoint.rollback()